@@ -0,0 +1,321 @@
+"""
+Benchmark and memory-regression suite for the site build scripts.
+
+Generates synthetic notebooks and report markdown at several sizes and
+times the converters in build_notebooks.py and build_report.py on them:
+
+- convert_notebook_to_page (whole page, figures inline, or extracted
+  with long outputs chunked),
+- convert_outputs_with_figures (code cell outputs only, truncated or
+  chunked),
+- convert_markdown (notebook markdown cells),
+- convert_markdown_to_html (report sections).
+
+Cases that write image files or output chunks write into a fresh
+directory on every run, so the timings include the disk writes. Each
+scenario has a few logs long enough to be chunked.
+
+For each scenario and function it records wall time (best of --repeat),
+throughput (input MB/s) and peak Python memory (tracemalloc, measured in
+a separate run so it does not slow the timing). With --save-baseline the
+results are stored in benchmarks/baseline.json, which is committed;
+otherwise they are compared with that baseline and the script exits with
+status 1 if a time or peak memory regressed past its threshold, or if
+there is no baseline to compare with.
+
+Usage:
+
+    python benchmark_build.py --save-baseline        # on the reference machine
+    python benchmark_build.py                        # check against it
+    python benchmark_build.py --scenario large --cells 400 --images 60
+"""
+
+import argparse
+import base64
+import json
+import random
+import struct
+import sys
+import tempfile
+import time
+import tracemalloc
+import zlib
+from pathlib import Path
+
+import build_notebooks
+import build_report
+
+# Configuration.
+BASELINE_PATH = Path(__file__).parent / 'benchmarks' / 'baseline.json'
+TIME_THRESHOLD = 0.25
+MEMORY_THRESHOLD = 0.10
+
+# Absolute slack, so sub-millisecond cases do not flag timer noise.
+MIN_SECONDS = 0.002
+MIN_PEAK_MB = 0.5
+
+# Synthetic inputs per scenario. "medium" is about the size of
+# 07_ols_ml.ipynb (1.5 MB), "large" of the archived
+# 07_ols_regression_shap.ipynb (3.4 MB).
+SCENARIOS = {
+    'small': {'cells': 20, 'markdown_ratio': 0.4, 'images': 2, 'image_kb': 40,
+              'table_rows': 20, 'stream_lines': 20, 'long_logs': 1, 'report_sections': 5},
+    'medium': {'cells': 120, 'markdown_ratio': 0.3, 'images': 12, 'image_kb': 60,
+               'table_rows': 100, 'stream_lines': 100, 'long_logs': 2, 'report_sections': 20},
+    'large': {'cells': 250, 'markdown_ratio': 0.3, 'images': 20, 'image_kb': 60,
+              'table_rows': 300, 'stream_lines': 300, 'long_logs': 4, 'report_sections': 60},
+}
+# Lines in each long log: past build_notebooks.LARGE_LINES, so it is chunked.
+LONG_LOG_LINES = 2000
+
+WORDS = ('heat', 'tract', 'calls', 'NDVI', 'canopy', 'income', 'weekly', 'SHAP',
+         'model', 'borough', 'density', 'subway', 'summer', 'complaints', 'the', 'and')
+
+
+# Synthetic inputs.
+def fake_png(n_bytes, rng):
+    """A PNG signature and IHDR followed by n_bytes of noise in one IDAT."""
+    def chunk(ctype, body):
+        return struct.pack('>I', len(body)) + ctype + body + struct.pack('>I', zlib.crc32(ctype + body))
+    ihdr = struct.pack('>IIBBBBB', rng.randint(400, 1600), rng.randint(300, 1200), 8, 6, 0, 0, 0)
+    noise = rng.randbytes(n_bytes)
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', ihdr) + chunk(b'IDAT', noise) + chunk(b'IEND', b'')
+
+
+def sentence(rng, n=12):
+    words = [rng.choice(WORDS) for _ in range(n)]
+    words[rng.randrange(n)] = f"**{rng.choice(WORDS)}**"
+    words[rng.randrange(n)] = f"*{rng.choice(WORDS)}*"
+    if rng.random() < 0.3:
+        words[rng.randrange(n)] = f"[{rng.choice(WORDS)}](https://example.org/{rng.choice(WORDS)})"
+    if rng.random() < 0.3:
+        words[rng.randrange(n)] = f"`{rng.choice(WORDS)}_col`"
+    return ' '.join(words) + '.'
+
+
+def markdown_cell(rng):
+    lines = [f"## {rng.choice(WORDS).title()} {rng.choice(WORDS)}", '']
+    lines += [sentence(rng) for _ in range(rng.randint(1, 4))]
+    lines.append('')
+    lines += [f"- {sentence(rng, 6)}" for _ in range(rng.randint(0, 5))]
+    return '\n'.join(lines)
+
+
+def html_table(rows, rng):
+    cells = ''.join(f"<th>{w}</th>" for w in WORDS[:8])
+    body = ''.join(
+        '<tr>' + ''.join(f"<td>{rng.random():.4f}</td>" for _ in range(8)) + '</tr>'
+        for _ in range(rows))
+    return f'<table class="dataframe"><thead><tr>{cells}</tr></thead><tbody>{body}</tbody></table>'
+
+
+def code_outputs(rng, config, image_b64):
+    """A mix of stream, table, plain-text and image outputs for one cell."""
+    outputs = []
+    kind = rng.random()
+    if kind < 0.35:
+        text = '\n'.join(f"{i}: {sentence(rng, 6)}" for i in range(config['stream_lines']))
+        outputs.append({'output_type': 'stream', 'name': 'stdout', 'text': [text]})
+    elif kind < 0.6:
+        outputs.append({'output_type': 'execute_result', 'data': {
+            'text/html': [html_table(config['table_rows'], rng)],
+            'text/plain': ['<DataFrame>']}})
+    elif kind < 0.8:
+        outputs.append({'output_type': 'execute_result', 'data': {
+            'text/plain': ['\n'.join(sentence(rng, 8) for _ in range(config['stream_lines'] // 4 + 1))]}})
+    if image_b64 is not None:
+        outputs.append({'output_type': 'display_data', 'metadata': {},
+                        'data': {'image/png': image_b64, 'text/plain': ['<Figure>']}})
+    return outputs
+
+
+def make_notebook(cells=100, markdown_ratio=0.3, images=10, image_kb=60, table_rows=200,
+                  stream_lines=200, long_logs=0, seed=0, **_):
+    """
+    Synthetic nbformat-4 notebook dict; about a tenth of images repeat, and
+    long_logs code cells also print LONG_LOG_LINES lines.
+    """
+    rng = random.Random(seed)
+    n_unique = max(1, images - images // 10)
+    pngs = [base64.b64encode(fake_png(image_kb * 1024, rng)).decode() for _ in range(n_unique)]
+    n_code = max(1, int(cells * (1 - markdown_ratio)))
+    image_cells = set(rng.sample(range(n_code), min(images, n_code)))
+    log_cells = set(rng.sample(range(n_code), min(long_logs, n_code)))
+
+    config = {'table_rows': table_rows, 'stream_lines': stream_lines}
+    nb_cells = []
+    code_idx = 0
+    for _ in range(cells):
+        if rng.random() < markdown_ratio:
+            nb_cells.append({'cell_type': 'markdown', 'metadata': {}, 'source': [markdown_cell(rng)]})
+            continue
+        image = rng.choice(pngs) if code_idx in image_cells else None
+        source = '\n'.join(f"df_{i} = df.groupby('GEOID')[{rng.choice(WORDS)!r}].mean()"
+                           for i in range(rng.randint(2, 15)))
+        outputs = code_outputs(rng, config, image)
+        if code_idx in log_cells:
+            log = [f"fold {i}: {sentence(rng, 6)}\n" for i in range(LONG_LOG_LINES)]
+            outputs.append({'output_type': 'stream', 'name': 'stdout', 'text': log})
+        nb_cells.append({'cell_type': 'code', 'metadata': {}, 'execution_count': code_idx,
+                         'source': [source], 'outputs': outputs})
+        code_idx += 1
+    return {'cells': nb_cells, 'metadata': {}, 'nbformat': 4, 'nbformat_minor': 5}
+
+
+def make_report_section(rng, paragraphs=30):
+    """One synthetic report section: headers, text, nested lists, a figure, code."""
+    lines = []
+    for i in range(paragraphs):
+        if i % 10 == 0:
+            lines += [f"## {rng.choice(WORDS).title()}", '']
+        if i % 7 == 3:
+            lines += [f"-   {sentence(rng, 6)}", f"    -   {sentence(rng, 5)}", f"-   {sentence(rng, 6)}", '']
+        elif i % 11 == 5:
+            lines += [f"![*{sentence(rng, 4)}*](notebooks/images/EDA/fig_{i}.png)", '']
+        elif i % 13 == 7:
+            lines += ['```python', *(f"x_{j} = {j} * y" for j in range(8)), '```', '']
+        else:
+            lines += [sentence(rng, 25), '']
+    return '\n'.join(lines)
+
+
+# Measurement.
+def measure(func, args, input_bytes, repeat):
+    """Best wall time over repeat runs, throughput and tracemalloc peak."""
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - t0)
+    best = min(times)
+
+    tracemalloc.start()
+    func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {'seconds': best, 'mb_per_s': input_bytes / best / 1e6 if best else 0.0,
+            'peak_mb': peak / 1e6, 'input_mb': input_bytes / 1e6}
+
+
+def run_scenario(name, config, repeat, workdir):
+    """Benchmarks for one scenario; returns {"scenario/function": result}."""
+    nb = make_notebook(**config, seed=len(name))
+    nb_path = Path(workdir) / f"{name}.ipynb"
+    nb_path.write_text(json.dumps(nb), encoding='utf-8')
+    nb_bytes = nb_path.stat().st_size
+    info = {'file': nb_path.name, 'page_id': f"bench_{name}", 'nav_name': name,
+            'title': name, 'description': 'Synthetic benchmark notebook.'}
+
+    outputs = [c['outputs'] for c in nb['cells'] if c['cell_type'] == 'code']
+    outputs_bytes = len(json.dumps(outputs).encode())
+    markdown = [''.join(c['source']) for c in nb['cells'] if c['cell_type'] == 'markdown']
+    markdown_bytes = sum(len(m.encode()) for m in markdown)
+
+    rng = random.Random(len(name))
+    sections = [make_report_section(rng) for _ in range(config['report_sections'])]
+    report_bytes = sum(len(s.encode()) for s in sections)
+
+    def fresh_dir(prefix):
+        # A new directory per run, so every run pays for its writes.
+        return Path(tempfile.mkdtemp(prefix=f"{name}_{prefix}_", dir=workdir))
+
+    def page_extracted():
+        out_dir = fresh_dir('page')
+        assets = build_notebooks.ImageAssets(out_dir / 'images', 'images/')
+        large = build_notebooks.LargeOutputs(out_dir / 'outputs', 'outputs/')
+        build_notebooks.convert_notebook_to_page(nb_path, info, [info], assets, large)
+
+    def outputs_chunked():
+        large = build_notebooks.LargeOutputs(fresh_dir('outputs'), 'outputs/')
+        return [build_notebooks.convert_outputs_with_figures(o, large=large) for o in outputs]
+
+    cases = {
+        'convert_notebook_to_page': (build_notebooks.convert_notebook_to_page,
+                                     (nb_path, info, [info]), nb_bytes),
+        'convert_notebook_to_page[extract]': (page_extracted, (), nb_bytes),
+        'convert_outputs_with_figures': (
+            lambda: [build_notebooks.convert_outputs_with_figures(o) for o in outputs], (), outputs_bytes),
+        'convert_outputs_with_figures[chunked]': (outputs_chunked, (), outputs_bytes),
+        'convert_markdown': (lambda: [build_notebooks.convert_markdown(m) for m in markdown], (), markdown_bytes),
+        'convert_markdown_to_html': (
+            lambda: [build_report.convert_markdown_to_html(s) for s in sections], (), report_bytes),
+    }
+
+    results = {}
+    for func_name, (func, args, size) in cases.items():
+        result = measure(func, args, size, repeat)
+        results[f"{name}/{func_name}"] = result
+        print(f"{name:>6}  {func_name:<40} {result['input_mb']:8.2f} MB  "
+              f"{result['seconds'] * 1000:9.1f} ms  {result['mb_per_s']:8.1f} MB/s  "
+              f"{result['peak_mb']:8.1f} MB peak")
+    return results
+
+
+def compare(results, baseline, time_threshold=TIME_THRESHOLD, memory_threshold=MEMORY_THRESHOLD):
+    """Regressions against baseline as a list of messages."""
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        if result['seconds'] > max(base['seconds'] * (1 + time_threshold), base['seconds'] + MIN_SECONDS):
+            regressions.append(f"{key}: {result['seconds'] * 1000:.1f} ms vs baseline "
+                               f"{base['seconds'] * 1000:.1f} ms")
+        if result['peak_mb'] > max(base['peak_mb'] * (1 + memory_threshold), base['peak_mb'] + MIN_PEAK_MB):
+            regressions.append(f"{key}: {result['peak_mb']:.1f} MB peak vs baseline "
+                               f"{base['peak_mb']:.1f} MB")
+    return regressions
+
+
+# Main.
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the site build converters.')
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                        help='scenario to run (repeatable; default all)')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per case')
+    parser.add_argument('--baseline', type=Path, default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='store these results as the new baseline')
+    parser.add_argument('--time-threshold', type=float, default=TIME_THRESHOLD,
+                        help='allowed relative slowdown (0.25 = 25%%)')
+    parser.add_argument('--memory-threshold', type=float, default=MEMORY_THRESHOLD,
+                        help='allowed relative peak memory growth')
+    for key in ('cells', 'images', 'image_kb', 'table_rows', 'stream_lines', 'long_logs',
+                'report_sections'):
+        parser.add_argument(f"--{key.replace('_', '-')}", type=int, dest=key,
+                            help=f"override {key} for the selected scenarios")
+    parser.add_argument('--markdown-ratio', type=float, dest='markdown_ratio')
+    args = parser.parse_args()
+
+    overrides = {k: v for k, v in vars(args).items() if k in SCENARIOS['small'] and v is not None}
+    names = args.scenario or list(SCENARIOS)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for name in names:
+            results.update(run_scenario(name, {**SCENARIOS[name], **overrides}, args.repeat, workdir))
+
+    print()
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(results, indent=2), encoding='utf-8')
+        print(f"Saved baseline: {args.baseline}.")
+        return
+
+    if not args.baseline.exists():
+        print(f"ERROR: No baseline at {args.baseline}; run with --save-baseline first.")
+        sys.exit(1)
+
+    baseline = json.loads(args.baseline.read_text(encoding='utf-8'))
+    regressions = compare(results, baseline, args.time_threshold, args.memory_threshold)
+    if regressions:
+        print(f"{len(regressions)} regressions:")
+        for message in regressions:
+            print(f"  {message}")
+        sys.exit(1)
+    print(f"No regressions against {args.baseline}.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Build manifest for incremental website builds.
+
+Shared by build_notebooks.py and build_report.py. For every output page the
+manifest records the hashes of its inputs (source file or section text,
+config entry, shared navigation, converter code) and of the page it wrote.
+A page is rebuilt only if an input hash changed or the output file is
+missing or was edited by hand.
+
+File hashes are cached by (size, mtime), so a no-op build reads no
+notebook JSON at all.
+
+write_gzip() keeps a precompressed <file>.gz next to each written page
+for servers that send gzip_static files (and for watch_site.py).
+
+Layout:
+
+    .build/
+        notebooks.json    # page_id -> inputs, output hash
+        report.json       # page_file -> inputs, output hash
+"""
+
+import gzip
+import hashlib
+import json
+import os
+from pathlib import Path
+
+# Configuration.
+MANIFEST_DIR = '.build'
+VERSION = 1
+
+
+def hash_bytes(data):
+    """sha1 hex digest of bytes or str."""
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    return hashlib.sha1(data).hexdigest()
+
+
+def hash_config(obj):
+    """Stable hash of a JSON-serializable config entry."""
+    return hash_bytes(json.dumps(obj, sort_keys=True, ensure_ascii=False))
+
+
+class BuildManifest:
+    """Input and output hashes per page, persisted as JSON."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.pages = {}
+        self.files = {}
+        if self.path.exists():
+            try:
+                data = json.loads(self.path.read_text(encoding='utf-8'))
+            except ValueError:
+                data = {}
+            if data.get('version') == VERSION:
+                self.pages = data.get('pages', {})
+                self.files = data.get('files', {})
+
+    def hash_file(self, path):
+        """Content hash of a file, reused while its size and mtime are unchanged."""
+        path = Path(path)
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            return None
+        stamp = [st.st_size, st.st_mtime_ns]
+        cached = self.files.get(str(path))
+        if cached and cached[0] == stamp:
+            return cached[1]
+        digest = hash_bytes(path.read_bytes())
+        self.files[str(path)] = [stamp, digest]
+        return digest
+
+    def is_current(self, key, inputs, output_path):
+        """True if key was built from the same inputs and its output is intact."""
+        record = self.pages.get(key)
+        if not record or record['inputs'] != inputs:
+            return False
+        return self.hash_file(output_path) == record['output']
+
+    def record(self, key, inputs, output_path, **extra):
+        """Store inputs and output hash; extra holds build stats to report on skips."""
+        self.pages[key] = {'inputs': inputs, 'output': self.hash_file(output_path), **extra}
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix('.tmp')
+        data = {'version': VERSION, 'pages': self.pages, 'files': self.files}
+        tmp.write_text(json.dumps(data, indent=1, sort_keys=True), encoding='utf-8')
+        os.replace(tmp, self.path)
+
+
+def write_if_changed(path, text):
+    """Write text unless the file already holds exactly it; True if written."""
+    path = Path(path)
+    data = text.encode('utf-8')
+    try:
+        if path.read_bytes() == data:
+            return False
+    except FileNotFoundError:
+        pass
+    path.write_bytes(data)
+    return True
+
+
+def write_gzip(path):
+    """Write path.gz (deterministic, level 9) unless it already matches; returns its path."""
+    path = Path(path)
+    gz_path = path.with_name(path.name + '.gz')
+    data = gzip.compress(path.read_bytes(), compresslevel=9, mtime=0)
+    try:
+        if gz_path.read_bytes() == data:
+            return gz_path
+    except FileNotFoundError:
+        pass
+    gz_path.write_bytes(data)
+    return gz_path
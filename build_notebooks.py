@@ -6,11 +6,26 @@ From nbconvert repository.
 https://github.com/jupyter/nbconvert
 """
 
+import argparse
+import base64
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
 import json
 import html
+from html.parser import HTMLParser
+import os
 from pathlib import Path
-import re
+import struct
 import sys
+import tempfile
+
+from build_manifest import MANIFEST_DIR, BuildManifest, hash_config, write_gzip, write_if_changed
+import site_markdown
+from site_markdown import notebook_markdown
+import site_search
+
+sys.path.insert(0, str(Path(__file__).parent / 'notebooks'))
+from pipeline import profiling
 
 # Configuration.
 NOTEBOOKS = [
@@ -79,6 +94,219 @@ NOTEBOOKS = [
     }
 ]
 
+# Extracted images go to docs/images/<IMAGE_SUBDIR>/, referenced from index.html.
+IMAGE_SUBDIR = 'notebooks'
+IMAGE_EXTENSIONS = {'image/png': 'png', 'image/jpeg': 'jpg'}
+
+# Large outputs go to docs/<OUTPUTS_SUBDIR>/<hash>/ as columnar JSON chunks.
+OUTPUTS_SUBDIR = 'outputs'
+CHUNK_ROWS = 500
+# Text outputs past either limit are chunked (or truncated with
+# --truncate-outputs); regression summaries and short logs stay inline.
+LARGE_LINES = 500
+LARGE_BYTES = 50000
+HTML_LIMIT = 50000
+
+# Image assets.
+def image_size(raw, mime):
+    """(width, height) from a PNG or JPEG header, or (None, None)."""
+    if mime == 'image/png' and raw[:8] == b'\x89PNG\r\n\x1a\n' and len(raw) >= 24:
+        return struct.unpack('>II', raw[16:24])
+    if mime == 'image/jpeg':
+        i = 2
+        while i + 9 < len(raw):
+            if raw[i] != 0xFF:
+                i += 1
+                continue
+            marker = raw[i + 1]
+            if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+                height, width = struct.unpack('>HH', raw[i + 5:i + 9])
+                return width, height
+            i += 2 + struct.unpack('>H', raw[i + 2:i + 4])[0]
+    return None, None
+
+
+class ImageAssets:
+    """Content-hashed image files shared by every page in one build."""
+
+    def __init__(self, images_dir, url_prefix):
+        self.images_dir = Path(images_dir)
+        self.url_prefix = url_prefix
+        self.seen = {}
+        self.written = 0
+        self.page_saved = 0
+
+    def add(self, b64_data, mime, metadata=None):
+        """Decode once, write if new; returns (url, width, height)."""
+        if isinstance(b64_data, list):
+            b64_data = ''.join(b64_data)
+        raw = base64.b64decode(b64_data)
+        digest = hashlib.sha1(raw).hexdigest()[:16]
+
+        if digest not in self.seen:
+            name = f"{digest}.{IMAGE_EXTENSIONS[mime]}"
+            path = self.images_dir / name
+            if not path.exists():
+                # Pages build in parallel; write then rename so no reader sees half a file.
+                self.images_dir.mkdir(parents=True, exist_ok=True)
+                tmp = path.with_name(f"{name}.{os.getpid()}.tmp")
+                tmp.write_bytes(raw)
+                os.replace(tmp, path)
+                self.written += 1
+            width, height = image_size(raw, mime)
+            self.seen[digest] = (f"{self.url_prefix}{name}", width, height)
+
+        url, width, height = self.seen[digest]
+        # Notebook metadata (e.g. retina figures) overrides the pixel size.
+        metadata = metadata or {}
+        width = metadata.get('width', width)
+        height = metadata.get('height', height)
+        self.page_saved += len(f"data:{mime};base64,") + len(b64_data) - len(url)
+        return url, width, height
+
+
+class TableParser(HTMLParser):
+    """Header and body cell text of the first <table> in an HTML output."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.header_rows = []
+        self.body_rows = []
+        self.in_table = False
+        self.done = False
+        self.section = 'tbody'
+        self.row = None
+        self.cell = None
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        if tag == 'table':
+            self.in_table = True
+        elif not self.in_table:
+            return
+        elif tag in ('thead', 'tbody'):
+            self.section = tag
+        elif tag == 'tr':
+            self.row = []
+        elif tag in ('td', 'th') and self.row is not None:
+            self.cell = []
+
+    def handle_endtag(self, tag):
+        if self.done or not self.in_table:
+            return
+        if tag in ('td', 'th') and self.cell is not None:
+            self.row.append(' '.join(''.join(self.cell).split()))
+            self.cell = None
+        elif tag == 'tr' and self.row is not None:
+            rows = self.header_rows if self.section == 'thead' else self.body_rows
+            rows.append(self.row)
+            self.row = None
+        elif tag == 'table':
+            self.done = True
+
+    def handle_data(self, data):
+        if self.cell is not None:
+            self.cell.append(data)
+
+
+class LargeOutputs:
+    """Oversized outputs written as JSON chunks for the on-demand viewer."""
+
+    def __init__(self, outputs_dir, url_prefix, chunk_rows=CHUNK_ROWS):
+        self.outputs_dir = Path(outputs_dir)
+        self.url_prefix = url_prefix
+        self.chunk_rows = chunk_rows
+        self.written = 0
+        self.page_moved = 0
+
+    def _write(self, key, meta, columns_or_lines):
+        """Write meta.json and chunk files once per content hash; returns the URL."""
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+        out_dir = self.outputs_dir / digest
+        if not (out_dir / 'meta.json').exists():
+            tmp_dir = self.outputs_dir / f"{digest}.{os.getpid()}.tmp"
+            tmp_dir.mkdir(parents=True, exist_ok=True)
+            n_rows = meta['n_rows']
+            for i, start in enumerate(range(0, n_rows, self.chunk_rows)):
+                stop = start + self.chunk_rows
+                if meta['kind'] == 'table':
+                    chunk = {'columns': [col[start:stop] for col in columns_or_lines]}
+                else:
+                    chunk = {'lines': columns_or_lines[start:stop]}
+                (tmp_dir / f"chunk_{i:04d}.json").write_text(
+                    json.dumps(chunk, separators=(',', ':'), ensure_ascii=False), encoding='utf-8')
+            (tmp_dir / 'meta.json').write_text(json.dumps(meta, ensure_ascii=False), encoding='utf-8')
+            try:
+                os.replace(tmp_dir, out_dir)
+                self.written += 1
+            except OSError:
+                # Another worker wrote the same output first.
+                for f in tmp_dir.iterdir():
+                    f.unlink()
+                tmp_dir.rmdir()
+        return f"{self.url_prefix}{digest}/"
+
+    def table(self, html_content):
+        """Viewer HTML for the first table in html_content, or None if there is none."""
+        parser = TableParser()
+        parser.feed(html_content)
+        if not parser.body_rows:
+            return None
+
+        width = max(len(r) for r in parser.header_rows + parser.body_rows)
+        names = (parser.header_rows[0] if parser.header_rows else []) + [''] * width
+        names = names[:width]
+        # pandas puts the index name on a second header row.
+        if len(parser.header_rows) > 1 and not names[0] and parser.header_rows[1][:1] != ['']:
+            names[0] = parser.header_rows[1][0] if parser.header_rows[1] else ''
+
+        rows = [r + [''] * (width - len(r)) for r in parser.body_rows]
+        columns = [list(col) for col in zip(*rows)]
+        meta = {'kind': 'table', 'names': names, 'n_rows': len(rows),
+                'chunk_rows': self.chunk_rows}
+        url = self._write(html_content, meta, columns)
+        self.page_moved += len(html_content)
+        return (f'<div class="output-large output-html" data-kind="table" data-src="{url}" '
+                f'data-rows="{len(rows)}" data-chunk="{self.chunk_rows}">'
+                f'<p class="output-note">Table: {len(rows):,} rows × {width} columns (loading…)</p></div>')
+
+    def text(self, text, css_class):
+        """Viewer HTML for a long stream or plain-text output."""
+        lines = text.split('\n')
+        meta = {'kind': 'text', 'n_rows': len(lines), 'chunk_rows': self.chunk_rows}
+        url = self._write(text, meta, lines)
+        self.page_moved += len(text)
+        return (f'<div class="output-large {css_class}" data-kind="text" data-src="{url}" '
+                f'data-rows="{len(lines)}" data-chunk="{self.chunk_rows}">'
+                f'<p class="output-note">{len(lines):,} lines of output (loading…)</p></div>')
+
+
+def is_large_text(text):
+    """True for text outputs past LARGE_LINES lines or LARGE_BYTES bytes."""
+    return text.count('\n') > LARGE_LINES or len(text.encode('utf-8')) > LARGE_BYTES
+
+
+def truncate_text(text, note):
+    """The first LARGE_LINES lines (at most LARGE_BYTES characters) and a note."""
+    head = '\n'.join(text.split('\n', LARGE_LINES)[:LARGE_LINES])[:LARGE_BYTES]
+    return f"{head}\n... [{note}]"
+
+
+def image_html(data, mime, figure_count, assets=None, metadata=None):
+    """<img> for one image output: data URI inline, or an extracted file."""
+    if assets is None:
+        return f'''
+<div class="output-figure">
+    <img class="output-image" src="data:{mime};base64,{data}" alt="Figure {figure_count}" />
+</div>'''
+    url, width, height = assets.add(data, mime, metadata)
+    size_attrs = f' width="{width}" height="{height}"' if width and height else ''
+    return f'''
+<div class="output-figure">
+    <img class="output-image" src="{url}"{size_attrs} loading="lazy" alt="Figure {figure_count}" />
+</div>'''
+
 # Conversion functions.
 def escape_html(text):
     """Escape HTML special characters."""
@@ -87,71 +315,17 @@ def escape_html(text):
 
 def convert_markdown(md_text):
     """Convert markdown to HTML."""
-    inline_codes = []
-    def save_inline_code(match):
-        inline_codes.append(match.group(1))
-        return f'__INLINE_CODE_{len(inline_codes)-1}__'
-    
-    md_text = re.sub(r'`([^`]+)`', save_inline_code, md_text)
-    
-    # Headers.
-    md_text = re.sub(r'^#### (.+)$', r'<h3>\1</h3>', md_text, flags=re.MULTILINE)
-    md_text = re.sub(r'^### (.+)$', r'<h3>\1</h3>', md_text, flags=re.MULTILINE)
-    md_text = re.sub(r'^## (.+)$', r'<h2>\1</h2>', md_text, flags=re.MULTILINE)
-    md_text = re.sub(r'^# (.+)$', r'<h1>\1</h1>', md_text, flags=re.MULTILINE)
-    
-    # Bold and italic.
-    md_text = re.sub(r'\*\*(.+?)\*\*', r'<b>\1</b>', md_text)
-    md_text = re.sub(r'\*(.+?)\*', r'<em>\1</em>', md_text)
-    md_text = re.sub(r'__(.+?)__', r'<b>\1</b>', md_text)
-    
-    # Links.
-    md_text = re.sub(r'\[([^\]]+)\]\(([^)]+)\)', r'<a href="\2" target="_blank">\1</a>', md_text)
-    
-    # Process lists.
-    lines = md_text.split('\n')
-    result_lines = []
-    in_list = False
-    
-    for line in lines:
-        # Check for list item (starts with "- ").
-        list_match = re.match(r'^- (.+)$', line)
-        if list_match:
-            if not in_list:
-                result_lines.append('<ul>')
-                in_list = True
-            result_lines.append(f'<li>{list_match.group(1)}</li>')
-        else:
-            if in_list:
-                result_lines.append('</ul>')
-                in_list = False
-            result_lines.append(line)
-    
-    if in_list:
-        result_lines.append('</ul>')
-    
-    md_text = '\n'.join(result_lines)
-    
-    # Restore inline code.
-    for i, code in enumerate(inline_codes):
-        md_text = md_text.replace(f'__INLINE_CODE_{i}__', f'<code>{code}</code>')
-    
-    # Paragraphs.
-    paragraphs = md_text.split('\n\n')
-    result = []
-    for p in paragraphs:
-        p = p.strip()
-        if p:
-            if p.startswith('<h') or p.startswith('<ul') or p.startswith('<ol') or p.startswith('<li'):
-                result.append(p)
-            else:
-                result.append(f'<p>{p}</p>')
-    
-    return '\n'.join(result)
+    return notebook_markdown(md_text)
 
 
-def convert_outputs_with_figures(outputs):
-    """Convert cell outputs to HTML with full figure support."""
+def convert_outputs_with_figures(outputs, assets=None, large=None):
+    """Convert cell outputs to HTML with full figure support.
+
+    With an ImageAssets store, PNG/JPEG figures are written as files and
+    lazy-loaded instead of inlined as base64. With a LargeOutputs store,
+    oversized tables and long text go to chunk files behind a scrolling
+    viewer instead of being dropped or truncated.
+    """
     if not outputs:
         return '', 0
     
@@ -164,29 +338,22 @@ def convert_outputs_with_figures(outputs):
         if output_type == 'stream':
             text = ''.join(output.get('text', []))
             if text.strip():
-                if len(text) > 3000:
-                    text = text[:3000] + '\n... [output truncated]'
-                html_parts.append(f'<pre class="output-stream">{escape_html(text)}</pre>')
+                if is_large_text(text) and large is not None:
+                    html_parts.append(large.text(text, 'output-stream'))
+                else:
+                    if is_large_text(text):
+                        text = truncate_text(text, 'output truncated')
+                    html_parts.append(f'<pre class="output-stream">{escape_html(text)}</pre>')
                 
         elif output_type in ('execute_result', 'display_data'):
             data = output.get('data', {})
             
-            # PNG images.
-            if 'image/png' in data:
-                img_data = data['image/png']
-                figure_count += 1
-                html_parts.append(f'''
-<div class="output-figure">
-    <img class="output-image" src="data:image/png;base64,{img_data}" alt="Figure {figure_count}" />
-</div>''')
-            # JPEG images.
-            elif 'image/jpeg' in data:
-                img_data = data['image/jpeg']
+            # PNG and JPEG images.
+            mime = next((m for m in IMAGE_EXTENSIONS if m in data), None)
+            if mime:
                 figure_count += 1
-                html_parts.append(f'''
-<div class="output-figure">
-    <img class="output-image" src="data:image/jpeg;base64,{img_data}" alt="Figure {figure_count}" />
-</div>''')
+                metadata = output.get('metadata', {}).get(mime)
+                html_parts.append(image_html(data[mime], mime, figure_count, assets, metadata))
             # SVG images.
             elif 'image/svg+xml' in data:
                 svg_data = ''.join(data['image/svg+xml'])
@@ -196,7 +363,12 @@ def convert_outputs_with_figures(outputs):
             # HTML (dataframes).
             elif 'text/html' in data:
                 html_content = ''.join(data['text/html'])
-                if len(html_content) > 50000:
+                viewer = None
+                if len(html_content) > HTML_LIMIT and large is not None and '<table' in html_content:
+                    viewer = large.table(html_content)
+                if viewer:
+                    html_parts.append(viewer)
+                elif len(html_content) > HTML_LIMIT:
                     html_parts.append('<div class="output-note">📋 <em>[Large table - see notebook]</em></div>')
                 else:
                     html_parts.append(f'<div class="output-html">{html_content}</div>')
@@ -204,9 +376,12 @@ def convert_outputs_with_figures(outputs):
             # Plain text.
             elif 'text/plain' in data:
                 text = ''.join(data['text/plain'])
-                if len(text) > 2000:
-                    text = text[:2000] + '\n... [truncated]'
-                html_parts.append(f'<pre class="output-text">{escape_html(text)}</pre>')
+                if is_large_text(text) and large is not None:
+                    html_parts.append(large.text(text, 'output-text'))
+                else:
+                    if is_large_text(text):
+                        text = truncate_text(text, 'truncated')
+                    html_parts.append(f'<pre class="output-text">{escape_html(text)}</pre>')
                 
         elif output_type == 'error':
             ename = output.get('ename', 'Error')
@@ -218,14 +393,16 @@ def convert_outputs_with_figures(outputs):
     return ('\n'.join(html_parts) if has_content else '', figure_count)
 
 
-def convert_notebook_to_page(nb_path, notebook_info, all_notebooks):
-    """Convert a notebook to a full HTML page fragment."""
+def convert_notebook_to_page(nb_path, notebook_info, all_notebooks, assets=None, large=None,
+                             nb=None):
+    """Convert a notebook to a full HTML page fragment; nb is the parsed notebook, if loaded."""
     
-    try:
-        with open(nb_path, 'r', encoding='utf-8') as f:
-            nb = json.load(f)
-    except Exception as e:
-        return f'<div class="content-middle"><h1>Error</h1><p>{e}</p></div>'
+    if nb is None:
+        try:
+            with open(nb_path, 'r', encoding='utf-8') as f:
+                nb = json.load(f)
+        except Exception as e:
+            return f'<div class="content-middle"><h1>Error</h1><p>{e}</p></div>'
     
     cells = nb.get('cells', [])
     html_parts = []
@@ -247,7 +424,7 @@ def convert_notebook_to_page(nb_path, notebook_info, all_notebooks):
             cell_count += 1
             escaped_code = escape_html(source)
             outputs = cell.get('outputs', [])
-            output_html, figs = convert_outputs_with_figures(outputs)
+            output_html, figs = convert_outputs_with_figures(outputs, assets, large)
             figure_count += figs
             
             html_parts.append(f'''
@@ -330,11 +507,207 @@ def convert_notebook_to_page(nb_path, notebook_info, all_notebooks):
     
     return page_html
 
-# Main.
-def main():
-    # Determine paths.
-    script_dir = Path(__file__).parent.resolve()
+# Search documents.
+def output_text(outputs):
+    """Searchable text of a code cell's outputs (figures skipped)."""
+    parts = []
+    for output in outputs:
+        output_type = output.get('output_type', '')
+        if output_type == 'stream':
+            parts.append(''.join(output.get('text', [])))
+        elif output_type in ('execute_result', 'display_data'):
+            data = output.get('data', {})
+            if any(m in data for m in IMAGE_EXTENSIONS) or 'image/svg+xml' in data:
+                continue
+            if 'text/html' in data:
+                parts.append(site_search.html_text(''.join(data['text/html'])))
+            elif 'text/plain' in data:
+                parts.append(''.join(data['text/plain']))
+        elif output_type == 'error':
+            parts.append(f"{output.get('ename', 'Error')}: {output.get('evalue', '')}")
+    return '\n'.join(parts)
+
+
+def notebook_documents(nb):
+    """
+    One search document per markdown cell, code cell and code cell output.
+    Anchors count the cell blocks convert_notebook_to_page() emits.
+    """
+    docs = []
+    block = 0
+    cell_count = 0
+    for cell in nb.get('cells', []):
+        cell_type = cell.get('cell_type', '')
+        source = ''.join(cell.get('source', []))
+        if not source.strip() or cell_type not in ('markdown', 'code'):
+            continue
+        
+        if cell_type == 'markdown':
+            text = site_search.markdown_text(source)
+            heading = next((line for line in source.splitlines() if line.startswith('#')), '')
+            label = ' '.join(site_search.markdown_text(heading).split()) or 'Markdown'
+            docs.append(site_search.document('markdown', label, block, text))
+        else:
+            cell_count += 1
+            docs.append(site_search.document('code', f'Code Cell {cell_count}', block, source))
+            text = output_text(cell.get('outputs', []))
+            if text.strip():
+                docs.append(site_search.document('output', f'Code Cell {cell_count} output', block, text))
+        block += 1
+    return docs
+
+
+# Build.
+def navigation_hash(all_notebooks):
+    """Hash of what every page's sidebar and prev/next links show."""
+    return hash_config([[nb['file'], nb['page_id'], nb['nav_name']] for nb in all_notebooks])
+
+
+def build_page(nb_path, nb_info, all_notebooks, images_dir=None, outputs_dir=None):
+    """Convert one notebook (runs in a worker); returns html, asset stats and search documents."""
+    assets = None
+    if images_dir is not None:
+        assets = ImageAssets(images_dir, f'images/{IMAGE_SUBDIR}/')
+    large = None
+    if outputs_dir is not None:
+        large = LargeOutputs(outputs_dir, f'{OUTPUTS_SUBDIR}/')
+    # Parsed once for both the page and the search documents.
+    try:
+        nb = json.loads(Path(nb_path).read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        nb = None
+    page_html = convert_notebook_to_page(nb_path, nb_info, all_notebooks, assets, large, nb)
+    
+    stats = {}
+    if assets is not None:
+        stats.update(saved=assets.page_saved, images=sorted(assets.seen), written=assets.written)
+    if large is not None and large.page_moved:
+        stats['moved'] = large.page_moved
+    
+    docs = notebook_documents(nb) if nb is not None else []
+    return page_html, stats, docs
+
+
+def build_pages(notebooks_dir, pages_dir, images_dir=None, outputs_dir=None, manifest=None,
+                force=False, jobs=1, verbose=True):
+    """
+    Rebuild every notebook page whose inputs changed since the last build,
+    with its gzip copy and search documents, then refresh the search index.
+
+    Returns the page_ids that were rebuilt.
+    """
+    notebooks_dir, pages_dir = Path(notebooks_dir), Path(pages_dir)
+    if manifest is None:
+        manifest = BuildManifest(Path(__file__).parent.resolve() / MANIFEST_DIR / 'notebooks.json')
+    search_cache = manifest.path.parent / site_search.SEARCH_SUBDIR
+    search_dir = pages_dir.parent / site_search.SEARCH_SUBDIR
+    
+    # Work out which pages are stale.
+    with profiling.stage('notebooks: check manifest', rows_in=len(NOTEBOOKS)) as s:
+        shared = {
+            'nav': navigation_hash(NOTEBOOKS),
+            'code': [manifest.hash_file(__file__), manifest.hash_file(site_markdown.__file__),
+                     manifest.hash_file(site_search.__file__)],
+            'images': 'inline' if images_dir is None else IMAGE_SUBDIR,
+            'outputs': 'truncate' if outputs_dir is None else [OUTPUTS_SUBDIR, CHUNK_ROWS],
+        }
+        
+        stale = {}
+        for nb_info in NOTEBOOKS:
+            nb_path = notebooks_dir / nb_info['file']
+            if not nb_path.exists():
+                continue
+            inputs = {'source': manifest.hash_file(nb_path), 'config': hash_config(nb_info), **shared}
+            output_path = pages_dir / f"{nb_info['page_id']}.html"
+            if (force or not manifest.is_current(nb_info['page_id'], inputs, output_path)
+                    or not site_search.documents_path(search_cache, nb_info['page_id']).exists()):
+                stale[nb_info['page_id']] = (nb_path, nb_info, inputs, output_path)
+        s.output(rows=len(stale))
+    
+    # Convert stale pages in parallel.
+    with profiling.stage('notebooks: convert') as s:
+        s.input(rows=len(stale), nbytes=sum(nb_path.stat().st_size for nb_path, _, _, _ in stale.values()))
+        results = {}
+        if len(stale) > 1 and jobs > 1:
+            with ProcessPoolExecutor(min(jobs, len(stale))) as pool:
+                futures = {page_id: pool.submit(build_page, nb_path, nb_info, NOTEBOOKS, images_dir, outputs_dir)
+                           for page_id, (nb_path, nb_info, _, _) in stale.items()}
+                results = {page_id: f.result() for page_id, f in futures.items()}
+        else:
+            results = {page_id: build_page(nb_path, nb_info, NOTEBOOKS, images_dir, outputs_dir)
+                       for page_id, (nb_path, nb_info, _, _) in stale.items()}
+        s.output(rows=len(results), nbytes=sum(len(page_html) for page_html, _, _ in results.values()))
     
+    success_count = 0
+    total_size = 0
+    total_saved = 0
+    total_moved = 0
+    all_images = set()
+    images_written = 0
+    
+    with profiling.stage('notebooks: write pages', rows_in=len(results)) as s:
+        for nb_info in NOTEBOOKS:
+            page_id = nb_info['page_id']
+            output_path = pages_dir / f"{page_id}.html"
+            
+            if page_id in results:
+                page_html, stats, docs = results[page_id]
+                write_if_changed(output_path, page_html)
+                write_gzip(output_path)
+                site_search.save_documents(search_cache, page_id, nb_info['title'], docs)
+                manifest.record(page_id, stale[page_id][2], output_path, **stats)
+                images_written += stats.get('written', 0)
+                status = ''
+            elif (notebooks_dir / nb_info['file']).exists():
+                stats = manifest.pages[page_id]
+                status = ', unchanged'
+                if not output_path.with_name(output_path.name + '.gz').exists():
+                    write_gzip(output_path)
+            else:
+                if verbose:
+                    print(f"NOT FOUND: {nb_info['file']}.")
+                continue
+            
+            size_kb = output_path.stat().st_size / 1024
+            total_size += size_kb
+            success_count += 1
+            all_images.update(stats.get('images', []))
+            saved_kb = stats.get('saved', 0) / 1024
+            total_saved += saved_kb
+            total_moved += stats.get('moved', 0) / 1024
+            if not verbose:
+                continue
+            notes = [f"{size_kb:.1f} KB"]
+            if saved_kb:
+                notes.append(f"{saved_kb:.1f} KB saved by image extraction")
+            if stats.get('moved'):
+                notes.append(f"{stats['moved'] / 1024:.1f} KB of output moved to chunks")
+            print(f"{page_id}.html ({', '.join(notes)}{status}).")
+        
+        manifest.save()
+        s.output(rows=success_count, nbytes=total_size * 1024)
+    
+    search_stats = None
+    if results or not (search_dir / 'index.json').exists():
+        with profiling.stage('notebooks: search index') as s:
+            search_stats = site_search.build_index(search_cache, search_dir)
+            s.output(rows=search_stats['docs'], nbytes=search_stats['bytes'])
+    
+    if verbose:
+        print()
+        print(f"Converted {success_count}/{len(NOTEBOOKS)} notebooks ({len(results)} rebuilt).")
+        print(f"Total Size: {total_size/1024:.2f} MB.")
+        if images_dir:
+            print(f"Images: {len(all_images)} unique, {images_written} written, {total_saved/1024:.2f} MB saved.")
+        if outputs_dir:
+            print(f"Large Outputs: {total_moved:.1f} KB moved to {OUTPUTS_SUBDIR}/ chunks.")
+        if search_stats:
+            print(site_search.describe(search_stats))
+    return list(results)
+
+
+def find_dirs(script_dir):
+    """(notebooks_dir, pages_dir) next to or above the script, or exit."""
     # Look for notebooks/directory.
     notebooks_dir = script_dir / 'notebooks'
     if not notebooks_dir.exists():
@@ -353,34 +726,84 @@ def main():
         pages_dir = script_dir / 'pages'
     
     pages_dir.mkdir(parents=True, exist_ok=True)
+    return notebooks_dir, pages_dir
+
+
+# Regression cases.
+# (name, cell output, expected to be chunked). An 84-line OLS summary, like
+# the ols_sm.summary() printouts in 07, used to be moved out of the page at
+# 3,000 characters.
+_OLS_SUMMARY = '\n'.join(f"x{i:<10} {i * 0.0123:>10.4f} {0.01:>10.3f} {1.5:>10.3f} {0.134:>8.3f}"
+                         for i in range(84)) + '\n'
+OUTPUT_CASES = [
+    ('OLS summary stream', {'output_type': 'stream', 'name': 'stdout', 'text': [_OLS_SUMMARY]}, False),
+    ('OLS summary result', {'output_type': 'execute_result',
+                            'data': {'text/plain': [_OLS_SUMMARY]}}, False),
+    ('600-line log', {'output_type': 'stream', 'name': 'stdout',
+                      'text': [f"fold {i}: done\n" for i in range(600)]}, True),
+    ('60 KB in 10 lines', {'output_type': 'stream', 'name': 'stdout',
+                           'text': [('x' * 6000 + '\n') * 10]}, True),
+]
+
+
+def check(cases=OUTPUT_CASES):
+    """Run the output placement cases; returns the names that failed."""
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        large = LargeOutputs(tmp, 'outputs/')
+        for name, output, chunked in cases:
+            html_out, _ = convert_outputs_with_figures([output], large=large)
+            if ('output-large' in html_out) != chunked:
+                failures.append(name)
+                print(f"FAIL: {name} should be {'chunked' if chunked else 'inline'}.")
+    print(f"Output cases: {len(cases) - len(failures)}/{len(cases)} passed.")
+    return failures
+
+
+# Main.
+def main():
+    parser = argparse.ArgumentParser(description='Convert notebooks to website pages.')
+    parser.add_argument('--inline-images', action='store_true',
+                        help='embed figures as base64 data URIs instead of image files')
+    parser.add_argument('--truncate-outputs', action='store_true',
+                        help='truncate long outputs and drop large tables instead of chunking them')
+    parser.add_argument('--force', action='store_true',
+                        help='rebuild every page, ignoring the build manifest')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1,
+                        help='worker processes for page conversion')
+    parser.add_argument('--profile', metavar='TRACE',
+                        help='write a Chrome trace of the build stages to TRACE and print a summary')
+    parser.add_argument('--check', action='store_true',
+                        help='run the output placement cases and exit')
+    args = parser.parse_args()
+    if args.check:
+        sys.exit(1 if check() else 0)
+    if args.profile:
+        profiling.enable(args.profile)
+
+    # Determine paths.
+    notebooks_dir, pages_dir = find_dirs(Path(__file__).parent.resolve())
+    
+    # Extracted figures sit next to the pages, under the site's images/.
+    images_dir = None if args.inline_images else pages_dir.parent / 'images' / IMAGE_SUBDIR
+    outputs_dir = None if args.truncate_outputs else pages_dir.parent / OUTPUTS_SUBDIR
     
     print("Building notebook pages.")
     print(f"Notebooks Directory: {notebooks_dir}.")
     print(f"Output Directory: {pages_dir}.")
+    if images_dir:
+        print(f"Images Directory: {images_dir}.")
+    if outputs_dir:
+        print(f"Large Outputs Directory: {outputs_dir}.")
     print()
     
-    success_count = 0
-    total_size = 0
-    
-    for nb_info in NOTEBOOKS:
-        nb_path = notebooks_dir / nb_info['file']
-        
-        if nb_path.exists():
-            page_html = convert_notebook_to_page(nb_path, nb_info, NOTEBOOKS)
-            output_path = pages_dir / f"{nb_info['page_id']}.html"
-            output_path.write_text(page_html, encoding='utf-8')
-            
-            size_kb = output_path.stat().st_size / 1024
-            total_size += size_kb
-            success_count += 1
-            print(f"{nb_info['page_id']}.html ({size_kb:.1f} KB).")
-        else:
-            print(f"NOT FOUND: {nb_info['file']}.")
+    with profiling.stage('build_notebooks'):
+        build_pages(notebooks_dir, pages_dir, images_dir, outputs_dir, force=args.force, jobs=args.jobs)
     
-    print()
-    print(f"Converted {success_count}/{len(NOTEBOOKS)} notebooks.")
-    print(f"Total Size: {total_size/1024:.2f} MB.")
+    if args.profile:
+        print()
+        profiling.report()
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
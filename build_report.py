@@ -6,8 +6,20 @@ Modified from nbconvert repository.
 https://github.com/jupyter/nbconvert
 """
 
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import os
 import re
 from pathlib import Path
+import sys
+
+from build_manifest import MANIFEST_DIR, BuildManifest, hash_bytes, hash_config, write_gzip, write_if_changed
+import site_markdown
+from site_markdown import report_markdown
+import site_search
+
+sys.path.insert(0, str(Path(__file__).parent / 'notebooks'))
+from pipeline import profiling
 
 # Configuration.
 
@@ -120,182 +132,7 @@ IMAGE_PATH_PREFIX = "images/"
 # Conversion functions.
 def convert_markdown_to_html(md_text):
     """Convert markdown to HTML with proper nested list support."""
-    
-    # First, protect and convert fenced code blocks
-    code_blocks = []
-    def save_code_block(match):
-        lang = match.group(1) or ''
-        code = match.group(2)
-        code_blocks.append((lang, code))
-        return f'__CODE_BLOCK_{len(code_blocks)-1}__'
-    
-    # Match fenced code blocks: ```language\ncode\n```
-    md_text = re.sub(r'```(\w*)\n(.*?)```', save_code_block, md_text, flags=re.DOTALL)
-    
-    # Protect inline code
-    inline_codes = []
-    def save_inline_code(match):
-        inline_codes.append(match.group(1))
-        return f'__INLINE_CODE_{len(inline_codes)-1}__'
-    
-    md_text = re.sub(r'`([^`]+)`', save_inline_code, md_text)
-    
-    # Process markdown line by line.
-    lines = md_text.split('\n')
-    html_lines = []
-    
-    i = 0
-    while i < len(lines):
-        line = lines[i]
-        
-        # Check for code block placeholder
-        code_block_match = re.match(r'^__CODE_BLOCK_(\d+)__$', line.strip())
-        if code_block_match:
-            idx = int(code_block_match.group(1))
-            lang, code = code_blocks[idx]
-            # Escape HTML in code
-            import html
-            escaped_code = html.escape(code)
-            lang_class = f' class="language-{lang}"' if lang else ''
-            html_lines.append(f'<pre><code{lang_class}>{escaped_code}</code></pre>')
-            i += 1
-            continue
-        
-        # Check for headers.
-        if line.startswith('#### '):
-            html_lines.append(f'<h3>{line[5:]}</h3>')
-            i += 1
-            continue
-        elif line.startswith('### '):
-            html_lines.append(f'<h2>{line[4:]}</h2>')
-            i += 1
-            continue
-        elif line.startswith('## '):
-            html_lines.append(f'<h1>{line[3:]}</h1>')
-            i += 1
-            continue
-        elif line.startswith('# '):
-            # Skip h1 headers.
-            i += 1
-            continue
-        
-        # Check for image.
-        img_match = re.match(r'!\[([^\]]*)\]\(([^)]+)\)', line)
-        if img_match:
-            alt_text = img_match.group(1)
-            img_path = img_match.group(2)
-            # Adjust path for website structure.
-            # Original markdown: notebooks/images/EDA/file.png
-            # Target: images/EDA/file.png (relative to site root for SPA)
-            if img_path.startswith('notebooks/images/'):
-                img_path = IMAGE_PATH_PREFIX + img_path[len('notebooks/images/'):]
-            elif img_path.startswith('notebooks/'):
-                img_path = IMAGE_PATH_PREFIX + img_path[len('notebooks/'):]
-            # Process caption for italics.
-            caption = process_inline_formatting(alt_text)
-            # Clean alt text.
-            clean_alt = re.sub(r'\*([^*]+)\*', r'\1', alt_text)
-            html_lines.append(f'<figure><img class="report-image" src="{img_path}" alt="{clean_alt}"><figcaption>{caption}</figcaption></figure>')
-            i += 1
-            continue
-        
-        # Check for list start.
-        list_match = re.match(r'^-\s+(.+)$', line)
-        if list_match:
-            # Collect list items.
-            list_html, new_i = process_list(lines, i)
-            html_lines.append(list_html)
-            i = new_i
-            continue
-        
-        # Regular paragraph or empty line.
-        stripped = line.strip()
-        if stripped:
-            # Process inline formatting.
-            processed = process_inline_formatting(stripped)
-            html_lines.append(f'<p>{processed}</p>')
-        
-        i += 1
-    
-    # Join and restore inline codes.
-    html = '\n'.join(html_lines)
-    
-    for idx, code in enumerate(inline_codes):
-        html = html.replace(f'__INLINE_CODE_{idx}__', f'<code>{code}</code>')
-    
-    return html
-
-def process_list(lines, start_idx):
-    """Process a list starting at start_idx, handling nested lists properly."""
-    html_parts = ['<ul>']
-    i = start_idx
-    
-    while i < len(lines):
-        line = lines[i]
-        
-        # Check for top-level list item.
-        top_match = re.match(r'^-\s+(.+)$', line)
-        if top_match:
-            content = process_inline_formatting(top_match.group(1))
-            
-            # Look ahead for nested items.
-            nested_items = []
-            j = i + 1
-            while j < len(lines):
-                nested_match = re.match(r'^    -\s+(.+)$', lines[j])
-                if nested_match:
-                    nested_items.append(process_inline_formatting(nested_match.group(1)))
-                    j += 1
-                else:
-                    break
-            
-            if nested_items:
-                # Item with nested list.
-                html_parts.append(f'<li>{content}')
-                html_parts.append('<ul>')
-                for nested in nested_items:
-                    html_parts.append(f'<li>{nested}</li>')
-                html_parts.append('</ul>')
-                html_parts.append('</li>')
-                i = j
-            else:
-                # Simple item.
-                html_parts.append(f'<li>{content}</li>')
-                i += 1
-            continue
-        
-        # Check if still in list.
-        if line.strip() == '':
-            # Check if next line continues the list.
-            if i + 1 < len(lines) and re.match(r'^-\s+', lines[i + 1]):
-                i += 1
-                continue
-            else:
-                # End of list.
-                break
-        elif re.match(r'^    -\s+', line):
-            # Orphan nested item.
-            i += 1
-            continue
-        else:
-            # End list.
-            break
-    
-    html_parts.append('</ul>')
-    return '\n'.join(html_parts), i
-
-def process_inline_formatting(text):
-    """Process inline formatting: bold, italic, links."""
-    # Bold.
-    text = re.sub(r'\*\*(.+?)\*\*', r'<strong>\1</strong>', text)
-    
-    # Italic.
-    text = re.sub(r'\*([^*]+)\*', r'<em>\1</em>', text)
-    
-    # Links.
-    text = re.sub(r'\[([^\]]+)\]\(([^)]+)\)', r'<a href="\2" target="_blank">\1</a>', text)
-    
-    return text
+    return report_markdown(md_text, IMAGE_PATH_PREFIX)
 
 def split_markdown_by_sections(md_content):
     """Split markdown content by h1 headers."""
@@ -335,18 +172,155 @@ def generate_page_html(title, content_html, right_panel_html):
 {right_panel_html}
 </div>'''
 
-# Main.
+def section_documents(section_content, page_title):
+    """One search document per ##/###/#### subsection, anchored on its heading."""
+    docs = []
+    label, anchor, lines = page_title, None, []
+    
+    def flush():
+        text = site_search.markdown_text('\n'.join(lines))
+        if text.strip():
+            docs.append(site_search.document('report', label, anchor, text))
+    
+    for line in section_content.split('\n'):
+        match = re.match(r'^#{2,4} (.+)$', line)
+        if match:
+            flush()
+            label = anchor = ' '.join(site_search.markdown_text(match.group(1)).split())
+            lines = [label]
+        else:
+            lines.append(line)
+    flush()
+    return docs
 
-def main():
-    script_dir = Path(__file__).parent.resolve()
+# Build.
+def build_page(section_content, config):
+    """Convert one report section to its page (runs in a worker)."""
+    content_html = convert_markdown_to_html(section_content)
+    return generate_page_html(config['page_title'], content_html, config['right_panel'])
+
+def build_pages(report_path, pages_dir, manifest=None, force=False, jobs=1, verbose=True):
+    """
+    Rebuild the pages whose report section, SECTION_MAPPING entry or
+    converter code changed since the last build, with their gzip copies and
+    search documents, then refresh the search index.
+
+    Returns the page files that were rebuilt.
+    """
+    pages_dir = Path(pages_dir)
+    if manifest is None:
+        manifest = BuildManifest(Path(__file__).parent.resolve() / MANIFEST_DIR / 'report.json')
+    search_cache = manifest.path.parent / site_search.SEARCH_SUBDIR
+    search_dir = pages_dir.parent / site_search.SEARCH_SUBDIR
     
+    # Read markdown.
+    with profiling.stage('report: split sections') as s:
+        md_content = Path(report_path).read_text(encoding='utf-8')
+        s.input(nbytes=len(md_content.encode('utf-8')))
+        
+        # Remove YAML frontmatter.
+        md_content = re.sub(r'^---\n.*?---\n', '', md_content, flags=re.DOTALL)
+        
+        # Split into sections.
+        sections = split_markdown_by_sections(md_content)
+        s.output(rows=len(sections))
+    
+    if verbose:
+        print(f"Found {len(sections)} sections:")
+        for section_name in sections:
+            print(f"  - {section_name}")
+        print()
+    
+    # Work out which pages are stale: each depends on its own section text,
+    # its SECTION_MAPPING entry and the converter/template code.
+    with profiling.stage('report: check manifest', rows_in=len(sections)) as s:
+        code_hash = [manifest.hash_file(__file__), manifest.hash_file(site_markdown.__file__),
+                     manifest.hash_file(site_search.__file__)]
+        
+        stale = {}
+        for section_name, section_content in sections.items():
+            if section_name not in SECTION_MAPPING:
+                continue
+            config = SECTION_MAPPING[section_name]
+            inputs = {
+                'source': hash_bytes(section_content),
+                'config': hash_config(config),
+                'code': code_hash,
+            }
+            output_path = pages_dir / config['page_file']
+            page = Path(config['page_file']).stem
+            if (force or not manifest.is_current(config['page_file'], inputs, output_path)
+                    or not site_search.documents_path(search_cache, page).exists()):
+                stale[section_name] = inputs
+        s.output(rows=len(stale))
+    
+    # Convert stale sections in parallel.
+    with profiling.stage('report: convert') as s:
+        s.input(rows=len(stale), nbytes=sum(len(sections[name].encode('utf-8')) for name in stale))
+        if len(stale) > 1 and jobs > 1:
+            with ProcessPoolExecutor(min(jobs, len(stale))) as pool:
+                futures = {name: pool.submit(build_page, sections[name], SECTION_MAPPING[name])
+                           for name in stale}
+                results = {name: f.result() for name, f in futures.items()}
+        else:
+            results = {name: build_page(sections[name], SECTION_MAPPING[name]) for name in stale}
+        s.output(rows=len(results), nbytes=sum(len(page) for page in results.values()))
+    
+    # Write pages.
+    with profiling.stage('report: write pages', rows_in=len(results)) as s:
+        for section_name in sections:
+            if section_name in SECTION_MAPPING:
+                config = SECTION_MAPPING[section_name]
+                output_path = pages_dir / config['page_file']
+                
+                status = ''
+                if section_name in results:
+                    write_if_changed(output_path, results[section_name])
+                    write_gzip(output_path)
+                    docs = section_documents(sections[section_name], config['page_title'])
+                    site_search.save_documents(search_cache, output_path.stem, config['page_title'], docs)
+                    manifest.record(config['page_file'], stale[section_name], output_path)
+                else:
+                    status = ', unchanged'
+                
+                if verbose:
+                    size_kb = output_path.stat().st_size / 1024
+                    print(f"{config['page_file']} ({size_kb:.1f} KB{status}).")
+            elif verbose:
+                print(f"Skipping unmapped section: {section_name}.")
+        
+        # Refresh missing or stale gzip copies, including hand-written pages
+        # (04_code.html, 07_about.html).
+        for path in pages_dir.glob('*.html'):
+            gz_path = path.with_name(path.name + '.gz')
+            if not gz_path.exists() or gz_path.stat().st_mtime < path.stat().st_mtime:
+                write_gzip(path)
+        
+        manifest.save()
+        s.output(rows=len(results))
+    
+    search_stats = None
+    if results or not (search_dir / 'index.json').exists():
+        with profiling.stage('report: search index') as s:
+            search_stats = site_search.build_index(search_cache, search_dir)
+            s.output(rows=search_stats['docs'], nbytes=search_stats['bytes'])
+    
+    if verbose:
+        print()
+        print(f"Updated report ({len(results)} pages rebuilt).")
+        if search_stats:
+            print(site_search.describe(search_stats))
+    return [SECTION_MAPPING[name]['page_file'] for name in results]
+
+
+def find_paths(script_dir):
+    """(report_path, pages_dir) next to or above the script; report_path None if missing."""
     # Look for Project_Report.md.
     report_path = script_dir / 'Project_Report.md'
     if not report_path.exists():
         report_path = script_dir.parent / 'Project_Report.md'
     if not report_path.exists():
-        print(f"ERROR: Cannot find Project_Report.md")
-        return
+        report_path = None
     
     # Look for docs/pages/.
     pages_dir = script_dir / 'docs' / 'pages'
@@ -356,47 +330,38 @@ def main():
         pages_dir = script_dir / 'pages'
     
     pages_dir.mkdir(parents=True, exist_ok=True)
+    return report_path, pages_dir
+
+# Main.
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert Project_Report.md to website pages.')
+    parser.add_argument('--force', action='store_true',
+                        help='rebuild every page, ignoring the build manifest')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1,
+                        help='worker processes for section conversion')
+    parser.add_argument('--profile', metavar='TRACE',
+                        help='write a Chrome trace of the build stages to TRACE and print a summary')
+    args = parser.parse_args()
+    if args.profile:
+        profiling.enable(args.profile)
+    
+    report_path, pages_dir = find_paths(Path(__file__).parent.resolve())
+    if report_path is None:
+        print(f"ERROR: Cannot find Project_Report.md")
+        return
     
     print("Building report pages from Project_Report.md.")
     print(f"Source: {report_path}")
     print(f"Output: {pages_dir}")
     print()
     
-    # Read markdown.
-    md_content = report_path.read_text(encoding='utf-8')
-    
-    # Remove YAML frontmatter.
-    md_content = re.sub(r'^---\n.*?---\n', '', md_content, flags=re.DOTALL)
-    
-    # Split into sections.
-    sections = split_markdown_by_sections(md_content)
-    
-    print(f"Found {len(sections)} sections:")
-    for section_name in sections:
-        print(f"  - {section_name}")
-    print()
-    
-    # Generate pages.
-    for section_name, section_content in sections.items():
-        if section_name in SECTION_MAPPING:
-            config = SECTION_MAPPING[section_name]
-            content_html = convert_markdown_to_html(section_content)
-            page_html = generate_page_html(
-                config['page_title'],
-                content_html,
-                config['right_panel']
-            )
-            
-            output_path = pages_dir / config['page_file']
-            output_path.write_text(page_html, encoding='utf-8')
-            
-            size_kb = output_path.stat().st_size / 1024
-            print(f"{config['page_file']} ({size_kb:.1f} KB).")
-        else:
-            print(f"Skipping unmapped section: {section_name}.")
+    with profiling.stage('build_report'):
+        build_pages(report_path, pages_dir, force=args.force, jobs=args.jobs)
     
-    print()
-    print("Updated report.")
+    if args.profile:
+        print()
+        profiling.report()
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
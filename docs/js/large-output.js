@@ -0,0 +1,148 @@
+// Large notebook outputs: virtualized viewer for chunked tables and text
+// Pages contain only a placeholder div; rows live in outputs/<hash>/chunk_NNNN.json
+// and are fetched on demand as the viewer scrolls.
+(() => {
+    const ROW_HEIGHT = 17;
+    const OVERSCAN = 20;
+    const chunkCache = new Map();
+
+    function fetchJSON(url) {
+        if (!chunkCache.has(url)) {
+            const request = fetch(url).then((response) => {
+                if (!response.ok) {
+                    throw new Error(`HTTP error! status: ${response.status}`);
+                }
+                return response.json();
+            });
+            // Drop failed requests so a later scroll can retry
+            request.catch(() => chunkCache.delete(url));
+            chunkCache.set(url, request);
+        }
+        return chunkCache.get(url);
+    }
+
+    function chunkUrl(src, index) {
+        return `${src}chunk_${String(index).padStart(4, "0")}.json`;
+    }
+
+    function escapeHTML(value) {
+        return String(value)
+            .replace(/&/g, "&amp;")
+            .replace(/</g, "&lt;")
+            .replace(/>/g, "&gt;");
+    }
+
+    // Rows [start, end) from the chunks that cover them
+    async function loadRows(src, meta, start, end) {
+        const first = Math.floor(start / meta.chunk_rows);
+        const last = Math.floor((end - 1) / meta.chunk_rows);
+        const chunks = [];
+        for (let i = first; i <= last; i++) {
+            chunks.push(fetchJSON(chunkUrl(src, i)));
+        }
+        const loaded = await Promise.all(chunks);
+
+        const rows = [];
+        loaded.forEach((chunk, offset) => {
+            const base = (first + offset) * meta.chunk_rows;
+            const count = chunk.lines ? chunk.lines.length : chunk.columns[0].length;
+            for (let r = 0; r < count; r++) {
+                const index = base + r;
+                if (index < start || index >= end) continue;
+                rows.push(chunk.lines ? chunk.lines[r] : chunk.columns.map((column) => column[r]));
+            }
+        });
+        return rows;
+    }
+
+    function renderText(rows) {
+        return rows.map(escapeHTML).join("\n");
+    }
+
+    function renderTable(meta, rows) {
+        const header = meta.names.map((name) => `<th>${escapeHTML(name)}</th>`).join("");
+        const body = rows
+            .map((row) => `<tr>${row.map((cell) => `<td>${escapeHTML(cell)}</td>`).join("")}</tr>`)
+            .join("");
+        return `<table><thead><tr>${header}</tr></thead><tbody>${body}</tbody></table>`;
+    }
+
+    async function initViewer(container) {
+        container.dataset.ready = "true";
+        const src = container.dataset.src;
+        const isTable = container.dataset.kind === "table";
+
+        let meta;
+        try {
+            meta = await fetchJSON(`${src}meta.json`);
+        } catch (error) {
+            console.error("Failed to load large output:", error);
+            container.querySelector(".output-note").textContent = "Output could not be loaded.";
+            return;
+        }
+
+        const note = container.querySelector(".output-note");
+        note.textContent = isTable
+            ? `Table: ${meta.n_rows.toLocaleString()} rows × ${meta.names.length} columns`
+            : `${meta.n_rows.toLocaleString()} lines of output`;
+
+        // Scroll area with a spacer sized for every row; only the visible
+        // window (plus overscan) is rendered into the view element.
+        const viewport = document.createElement("div");
+        viewport.className = "output-large-viewport";
+        const spacer = document.createElement("div");
+        spacer.className = "output-large-spacer";
+        spacer.style.height = `${meta.n_rows * ROW_HEIGHT + (isTable ? ROW_HEIGHT : 0)}px`;
+        const view = document.createElement(isTable ? "div" : "pre");
+        view.className = "output-large-view";
+        spacer.appendChild(view);
+        viewport.appendChild(spacer);
+        container.appendChild(viewport);
+
+        let pending = null;
+        let rendered = null;
+
+        function visibleRange() {
+            const start = Math.max(0, Math.floor(viewport.scrollTop / ROW_HEIGHT) - OVERSCAN);
+            const visible = Math.ceil(viewport.clientHeight / ROW_HEIGHT) + 2 * OVERSCAN;
+            return [start, Math.min(meta.n_rows, start + visible)];
+        }
+
+        async function render() {
+            const [start, end] = visibleRange();
+            const key = `${start}:${end}`;
+            if (key === rendered || end <= start) return;
+            pending = key;
+
+            const rows = await loadRows(src, meta, start, end);
+            // A newer scroll may have moved on while chunks were loading
+            if (pending !== key) return;
+            view.style.transform = `translateY(${start * ROW_HEIGHT}px)`;
+            view.innerHTML = isTable ? renderTable(meta, rows) : renderText(rows);
+            rendered = key;
+        }
+
+        function schedule() {
+            requestAnimationFrame(() => {
+                render().catch((error) => console.error("Failed to load output rows:", error));
+            });
+        }
+
+        viewport.addEventListener("scroll", schedule, { passive: true });
+        schedule();
+    }
+
+    function initAll(root) {
+        root.querySelectorAll(".output-large:not([data-ready])").forEach(initViewer);
+    }
+
+    document.addEventListener("DOMContentLoaded", () => {
+        const contentMiddle = document.getElementById("content-middle");
+        if (!contentMiddle) return;
+
+        // app.js swaps page fragments in with innerHTML; pick up new viewers
+        new MutationObserver(() => initAll(contentMiddle))
+            .observe(contentMiddle, { childList: true, subtree: true });
+        initAll(contentMiddle);
+    });
+})();
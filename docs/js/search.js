@@ -0,0 +1,181 @@
+// Site search over the prebuilt index in search/ (see site_search.py)
+// index.json (document table and shard list) is fetched on first use; each
+// query term then loads only the shard for its first letter(s).
+(() => {
+    const MAX_RESULTS = 20;
+    const DEBOUNCE_MS = 120;
+    const STOPWORDS = new Set(
+        "an and are as at be by for from has in is it its of on or that the this to was were with".split(" ")
+    );
+    const KIND_LABELS = { report: "Report", markdown: "Notes", code: "Code", output: "Output" };
+
+    let indexRequest = null;
+    const shardRequests = new Map();
+
+    function loadIndex() {
+        if (!indexRequest) {
+            indexRequest = fetch("search/index.json").then((response) => {
+                if (!response.ok) {
+                    throw new Error(`HTTP error! status: ${response.status}`);
+                }
+                return response.json();
+            });
+            indexRequest.catch(() => { indexRequest = null; });
+        }
+        return indexRequest;
+    }
+
+    function loadShard(index, prefix) {
+        if (!index.shards.includes(prefix)) {
+            return Promise.resolve({});
+        }
+        if (!shardRequests.has(prefix)) {
+            const request = fetch(`search/shards/${prefix}.json`).then((response) => response.json());
+            request.catch(() => shardRequests.delete(prefix));
+            shardRequests.set(prefix, request);
+        }
+        return shardRequests.get(prefix);
+    }
+
+    // Same rules as site_search.terms()
+    function keep(term) {
+        if (term.length < 2 || STOPWORDS.has(term)) return false;
+        return !(/^[0-9]/.test(term) && term.length > 4);
+    }
+
+    function queryTerms(query) {
+        const found = new Set();
+        for (let token of query.toLowerCase().match(/[a-z0-9_]+/g) || []) {
+            token = token.replace(/^_+|_+$/g, "");
+            if (token.includes("_")) {
+                token.split("_").filter(keep).forEach((part) => found.add(part));
+            }
+            if (keep(token)) found.add(token);
+        }
+        return [...found];
+    }
+
+    // Documents matching every term (index terms matched by prefix), tf-idf ranked
+    async function search(query) {
+        const index = await loadIndex();
+        const terms = queryTerms(query);
+        if (!terms.length) return [];
+
+        const shards = await Promise.all(terms.map((term) => loadShard(index, term.slice(0, index.prefix))));
+        let scores = null;
+        terms.forEach((term, i) => {
+            const matched = new Map();
+            for (const [candidate, postings] of Object.entries(shards[i])) {
+                if (!candidate.startsWith(term)) continue;
+                const idf = Math.log(1 + index.docs.length / postings.length);
+                for (const [doc, tf] of postings) {
+                    matched.set(doc, (matched.get(doc) || 0) + tf * idf);
+                }
+            }
+            if (scores === null) {
+                scores = matched;
+            } else {
+                for (const doc of [...scores.keys()]) {
+                    if (matched.has(doc)) {
+                        scores.set(doc, scores.get(doc) + matched.get(doc));
+                    } else {
+                        scores.delete(doc);
+                    }
+                }
+            }
+        });
+
+        return [...scores.entries()]
+            .sort((a, b) => b[1] - a[1])
+            .slice(0, MAX_RESULTS)
+            .map(([doc]) => index.docs[doc]);
+    }
+
+    function escapeHTML(value) {
+        return String(value)
+            .replace(/&/g, "&amp;")
+            .replace(/</g, "&lt;")
+            .replace(/>/g, "&gt;")
+            .replace(/"/g, "&quot;");
+    }
+
+    // Scroll to the matching cell or heading once its page has loaded
+    function revealTarget(contentMiddle, target) {
+        let element = null;
+        if (target.kind === "report") {
+            if (target.anchor === null) return;
+            const normalize = (text) => text.replace(/\s+/g, " ").trim();
+            element = [...contentMiddle.querySelectorAll(".report-content h1, .report-content h2, .report-content h3")]
+                .find((heading) => normalize(heading.textContent) === target.anchor);
+        } else {
+            element = contentMiddle.querySelectorAll(".cell-markdown, .cell-code-wrapper")[target.anchor];
+            const fold = element && element.querySelector(".code-fold");
+            if (fold && target.kind === "code") fold.open = true;
+        }
+        if (!element) return;
+        element.scrollIntoView({ block: "start" });
+        element.classList.add("search-hit");
+        setTimeout(() => element.classList.remove("search-hit"), 2000);
+    }
+
+    document.addEventListener("DOMContentLoaded", () => {
+        const input = document.getElementById("site-search");
+        const results = document.getElementById("search-results");
+        const contentMiddle = document.getElementById("content-middle");
+        if (!input || !results || !contentMiddle) return;
+
+        let timer = null;
+        let latest = 0;
+        let pendingTarget = null;
+
+        input.addEventListener("focus", () => loadIndex().catch(() => {}), { once: true });
+
+        input.addEventListener("input", () => {
+            clearTimeout(timer);
+            timer = setTimeout(async () => {
+                const query = input.value.trim();
+                const request = ++latest;
+                if (!query) {
+                    results.innerHTML = "";
+                    return;
+                }
+                const started = performance.now();
+                let docs;
+                try {
+                    docs = await search(query);
+                } catch (error) {
+                    console.error("Search Error:", error);
+                    results.innerHTML = `<li class="search-empty">Search is unavailable.</li>`;
+                    return;
+                }
+                // Ignore answers to queries the user has already typed past
+                if (request !== latest) return;
+                console.log(`Search "${query}": ${docs.length} results in ${(performance.now() - started).toFixed(1)} ms.`);
+
+                results.innerHTML = docs.length
+                    ? docs.map(([page, title, kind, label, anchor, snippet]) => `
+                        <li><a href="pages/${page}.html" data-page="${page}" data-kind="${kind}" data-anchor="${escapeHTML(JSON.stringify(anchor))}">
+                            <span class="search-result-title">${escapeHTML(title)} · ${escapeHTML(label)}</span>
+                            <span class="search-result-kind">${KIND_LABELS[kind] || kind}</span>
+                            <span class="search-result-snippet">${escapeHTML(snippet)}</span>
+                        </a></li>`).join("")
+                    : `<li class="search-empty">No results.</li>`;
+            }, DEBOUNCE_MS);
+        });
+
+        // Result links carry data-page, so app.js loads the page; remember
+        // where to scroll once it arrives
+        results.addEventListener("click", (e) => {
+            const link = e.target.closest("a[data-page]");
+            if (!link) return;
+            pendingTarget = { kind: link.dataset.kind, anchor: JSON.parse(link.dataset.anchor) };
+        }, true);
+
+        new MutationObserver(() => {
+            if (pendingTarget && contentMiddle.textContent !== "Loading...") {
+                revealTarget(contentMiddle, pendingTarget);
+                pendingTarget = null;
+            }
+        }).observe(contentMiddle, { childList: true });
+    });
+})();
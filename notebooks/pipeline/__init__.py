@@ -0,0 +1,7 @@
+"""
+Reusable pipeline stages for the notebooks.
+
+Import from a notebook running in notebooks/, e.g.
+
+    from pipeline.download_311 import download_311
+"""
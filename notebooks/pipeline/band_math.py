@@ -0,0 +1,213 @@
+"""
+Windowed, out-of-core band math for Landsat Collection 2 Level-2 scenes.
+
+Derives NDVI and land surface temperature (LST) from the SR/ST bands of a
+scene such as LC08_L2SP_013032_20250729_20250807_02_T1_SR.zip. Bands are
+read window by window (straight out of the zip through GDAL's /vsizip/),
+scaled, QA-masked and written to tiled, compressed GeoTIFFs, so peak memory
+depends on the window size and worker count rather than on the scene size.
+Windows are spread across a process pool; each worker opens the bands once.
+
+Scenes whose outputs already exist and are newer than the scene file are
+skipped.
+"""
+
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+from zipfile import ZipFile
+
+import numpy as np
+import rasterio
+from rasterio.windows import Window
+
+from . import profiling
+
+# Configuration.
+OUTPUT_DIR = Path("data/raster/processed")
+BLOCK_SIZE = 512
+MAX_WORKERS = os.cpu_count() or 1
+
+# Collection 2 Level-2 scale factors.
+SR_SCALE, SR_OFFSET = 0.0000275, -0.2
+ST_SCALE, ST_OFFSET = 0.00341802, 149.0
+
+# QA_PIXEL bits to mask: fill, dilated cloud, cirrus, cloud, cloud shadow, snow.
+QA_MASK_BITS = (0, 1, 2, 3, 4, 5)
+QA_MASK = sum(1 << b for b in QA_MASK_BITS)
+
+# Band suffixes per sensor (Landsat 8/9 OLI/TIRS).
+BANDS = {"red": "SR_B4", "nir": "SR_B5", "st": "ST_B10", "qa": "QA_PIXEL"}
+
+PRODUCTS = ("NDVI", "LST")
+PRODUCT_BANDS = {"NDVI": ("red", "nir", "qa"), "LST": ("st", "qa")}
+
+OUTPUT_PROFILE = {
+    "driver": "GTiff",
+    "dtype": "float32",
+    "count": 1,
+    "nodata": np.nan,
+    "tiled": True,
+    "blockxsize": BLOCK_SIZE,
+    "blockysize": BLOCK_SIZE,
+    "compress": "deflate",
+    "predictor": 3,
+    "BIGTIFF": "IF_SAFER",
+}
+
+
+# Scene discovery.
+def scene_id(scene_path):
+    """Landsat product ID from a scene zip or folder name."""
+    name = Path(scene_path).name
+    return re.sub(r"(_SR)?(\.zip)?$", "", name, flags=re.IGNORECASE)
+
+
+def scene_bands(scene_path):
+    """Map band keys (red, nir, st, qa) to GDAL-readable paths."""
+    scene_path = Path(scene_path)
+    if scene_path.suffix.lower() == ".zip":
+        with ZipFile(scene_path) as zf:
+            names = zf.namelist()
+        prefix = f"/vsizip/{scene_path.resolve()}/"
+    else:
+        names = [p.name for p in scene_path.iterdir()]
+        prefix = f"{scene_path.resolve()}/"
+
+    bands = {}
+    for key, suffix in BANDS.items():
+        match = next((n for n in names if n.upper().endswith(f"_{suffix}.TIF")), None)
+        if match is not None:
+            bands[key] = prefix + match
+    return bands
+
+
+# Block kernels.
+def qa_clear(qa):
+    """True where no masked QA_PIXEL bit is set."""
+    return (qa.astype("uint16") & QA_MASK) == 0
+
+
+def ndvi_block(red, nir, qa):
+    """NDVI from scaled SR reflectance, NaN where masked or invalid."""
+    red = red.astype("float32") * SR_SCALE + SR_OFFSET
+    nir = nir.astype("float32") * SR_SCALE + SR_OFFSET
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ndvi = (nir - red) / (nir + red)
+    ndvi[~qa_clear(qa) | (red <= 0) | (nir <= 0)] = np.nan
+    return np.clip(ndvi, -1, 1)
+
+
+def lst_block(st, qa):
+    """Surface temperature in degrees Celsius, NaN where masked."""
+    lst = st.astype("float32") * ST_SCALE + ST_OFFSET - 273.15
+    lst[~qa_clear(qa) | (st == 0)] = np.nan
+    return lst
+
+
+KERNELS = {"NDVI": ndvi_block, "LST": lst_block}
+
+
+# Worker state.
+_worker_sources = {}
+
+
+def _init_worker(bands):
+    """Open each band once per worker process."""
+    _worker_sources.clear()
+    for key, path in bands.items():
+        _worker_sources[key] = rasterio.open(path)
+
+
+def _compute_window(window, products):
+    """Read one window of every needed band and apply the kernels."""
+    needed = sorted({b for p in products for b in PRODUCT_BANDS[p]})
+    arrays = {b: _worker_sources[b].read(1, window=window) for b in needed}
+    return window, {p: KERNELS[p](*(arrays[b] for b in PRODUCT_BANDS[p])) for p in products}
+
+
+def iter_windows(height, width, block_size=BLOCK_SIZE):
+    """Block windows covering a raster, row by row."""
+    for row in range(0, height, block_size):
+        for col in range(0, width, block_size):
+            yield Window(col, row, min(block_size, width - col), min(block_size, height - row))
+
+
+# Scene processing.
+def output_paths(scene_path, out_dir=OUTPUT_DIR, products=PRODUCTS):
+    """Output GeoTIFF path per product."""
+    sid = scene_id(scene_path)
+    return {p: Path(out_dir) / f"{sid}_{p}.tif" for p in products}
+
+
+def is_up_to_date(scene_path, outputs):
+    """True if every output exists and is newer than the scene."""
+    src_mtime = Path(scene_path).stat().st_mtime
+    return all(p.exists() and p.stat().st_mtime >= src_mtime for p in outputs.values())
+
+
+@profiling.profiled("band math scene", output=False)
+def process_scene(scene_path, out_dir=OUTPUT_DIR, products=PRODUCTS,
+                  block_size=BLOCK_SIZE, max_workers=MAX_WORKERS, force=False):
+    """
+    Derive products for one scene, window by window.
+
+    At most 2 * max_workers windows are in flight at once, which bounds
+    peak memory. Returns the output paths, or None if skipped.
+    """
+    outputs = output_paths(scene_path, out_dir, products)
+    if not force and is_up_to_date(scene_path, outputs):
+        print(f"Up to date: {scene_id(scene_path)}.")
+        return None
+
+    profiling.current().input(Path(scene_path))
+    bands = scene_bands(scene_path)
+    needed = {b for p in products for b in PRODUCT_BANDS[p]}
+    missing = needed - set(bands)
+    if missing:
+        raise FileNotFoundError(f"{scene_path}: missing bands {sorted(missing)}")
+    bands = {b: bands[b] for b in needed}
+
+    with rasterio.open(bands["qa"]) as ref:
+        profile = dict(OUTPUT_PROFILE, crs=ref.crs, transform=ref.transform,
+                       width=ref.width, height=ref.height,
+                       blockxsize=block_size, blockysize=block_size)
+        windows = iter_windows(ref.height, ref.width, block_size)
+
+    Path(out_dir).mkdir(parents=True, exist_ok=True)
+    tmp_paths = {p: path.with_suffix(".tmp.tif") for p, path in outputs.items()}
+    dsts = {p: rasterio.open(tmp_paths[p], "w", **profile) for p in products}
+
+    try:
+        with ProcessPoolExecutor(max_workers, initializer=_init_worker,
+                                 initargs=(bands,)) as pool:
+            pending = set()
+            for window in windows:
+                pending.add(pool.submit(_compute_window, window, products))
+                if len(pending) >= 2 * max_workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    _write_results(done, dsts)
+            _write_results(pending, dsts)
+    finally:
+        for dst in dsts.values():
+            dst.close()
+
+    for p in products:
+        os.replace(tmp_paths[p], outputs[p])
+        profiling.current().output(outputs[p])
+    print(f"Processed: {scene_id(scene_path)}.")
+    return outputs
+
+
+def _write_results(futures, dsts):
+    for future in futures:
+        window, results = future.result()
+        for product, data in results.items():
+            dsts[product].write(data, 1, window=window)
+
+
+@profiling.profiled("band math", output=False)
+def process_scenes(scene_paths, out_dir=OUTPUT_DIR, **kwargs):
+    """Process several scenes in turn, skipping those already up to date."""
+    return {scene_id(s): process_scene(s, out_dir, **kwargs) for s in scene_paths}
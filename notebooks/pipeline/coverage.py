@@ -0,0 +1,113 @@
+"""
+Area-only polygon overlay for tract coverage ratios.
+
+Computes the share of each tract covered by a polygon layer (water for
+WCR, parks, the land-only city boundary) without building the full
+gpd.overlay result used in 04_additional_feature.ipynb. Only intersection
+areas are computed:
+
+- an STRtree pairs each tract with the layer polygons it touches, and
+  tracts with no pair are fully outside (area 0);
+- pairs where the layer polygon contains the tract, or the tract contains
+  the layer polygon, are resolved with prepared containment tests and
+  take the smaller polygon's area directly;
+- the remaining boundary pairs are clipped in parallel chunks.
+
+Geometries are prepared as copies, so the caller's GeoDataFrames are left
+unprepared. Like the overlay, overlapping polygons within one layer are
+each counted.
+
+Usage:
+
+    wcr = coverage_ratio(tracts, water, name="WCR")
+    land = coverage_ratio(tracts, city_land, name="LAND_RATIO")
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import shapely
+
+from . import profiling
+
+# Configuration.
+MAX_WORKERS = os.cpu_count() or 1
+CHUNK_PAIRS = 2000
+
+
+def _intersection_area(left_wkb, right_wkb):
+    """Pairwise intersection area for one chunk (runs in a worker)."""
+    left = shapely.from_wkb(left_wkb)
+    right = shapely.from_wkb(right_wkb)
+    return shapely.area(shapely.intersection(left, right))
+
+
+def _prepared(geoms):
+    """Prepared copies of geometries, leaving the originals unprepared."""
+    copies = shapely.from_wkb(shapely.to_wkb(geoms))
+    shapely.prepare(copies)
+    return copies
+
+
+@profiling.profiled("coverage overlay", input_arg="tracts")
+def overlap_area(tracts, layer, max_workers=MAX_WORKERS, chunk_pairs=CHUNK_PAIRS):
+    """Per-tract area covered by the layer, in the tracts' CRS units."""
+    if layer.crs != tracts.crs:
+        layer = layer.to_crs(tracts.crs)
+
+    tract_geoms = _prepared(tracts.geometry.to_numpy())
+    layer_geoms = layer.geometry.to_numpy()
+    layer_geoms = layer_geoms[~shapely.is_missing(layer_geoms) & ~shapely.is_empty(layer_geoms)]
+    layer_geoms = _prepared(layer_geoms)
+    profiling.current().input(layer_geoms)
+
+    tree = shapely.STRtree(layer_geoms)
+    tract_idx, layer_idx = tree.query(tract_geoms, predicate="intersects")
+
+    t = tract_geoms[tract_idx]
+    l = layer_geoms[layer_idx]
+    area = np.full(len(tract_idx), np.nan)
+
+    # Containment shortcuts.
+    tract_inside = shapely.contains(l, t)
+    area[tract_inside] = shapely.area(t[tract_inside])
+    layer_inside = ~tract_inside & shapely.contains(t, l)
+    area[layer_inside] = shapely.area(l[layer_inside])
+
+    # Clip only the boundary pairs.
+    edge = np.flatnonzero(np.isnan(area))
+    with profiling.stage("coverage clip", rows_in=len(edge)):
+        chunks = [edge[i:i + chunk_pairs] for i in range(0, len(edge), chunk_pairs)]
+        if max_workers > 1 and len(chunks) > 1:
+            with ProcessPoolExecutor(max_workers) as pool:
+                results = pool.map(
+                    _intersection_area,
+                    [shapely.to_wkb(t[c]) for c in chunks],
+                    [shapely.to_wkb(l[c]) for c in chunks],
+                )
+                for c, res in zip(chunks, results):
+                    area[c] = res
+        elif len(edge):
+            area[edge] = shapely.area(shapely.intersection(t[edge], l[edge]))
+
+    return np.bincount(tract_idx, weights=area, minlength=len(tract_geoms))
+
+
+def coverage_ratio(tracts, layer, geoid_col="geoid", name="WCR", **kwargs):
+    """
+    Coverage ratio per tract: layer area inside the tract / tract area.
+
+    Returns geoid_col, {name}_area and {name}.
+    """
+    covered = overlap_area(tracts, layer, **kwargs)
+    tract_area = tracts.geometry.area.to_numpy()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ratio = covered / tract_area
+
+    return pd.DataFrame({
+        geoid_col: tracts[geoid_col].to_numpy(),
+        f"{name}_area": covered,
+        name: ratio,
+    })
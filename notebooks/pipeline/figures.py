@@ -0,0 +1,343 @@
+"""
+Parallel, change-aware renderer for the SHAP and EDA figure sets.
+
+Each figure is declared as a FigureSpec: an output path, a registered plot
+function, its data arrays and its plot parameters. The spec hash (plot
+function source + parameters + data) is written into the PNG's text
+metadata; render() skips every figure whose file already carries the
+same hash and draws the rest on a process pool with the Agg backend. So
+changing one feature re-renders one PNG instead of the whole set.
+
+Spec builders cover the SHAP set (per-feature scatters, the beeswarm and
+the importance bars) and the EDA set (side-by-side histograms and tract
+choropleths sharing one set of class breaks). A spec with ncols > 1 draws
+one panel per column of its values.
+
+Usage:
+
+    specs = shap_scatter_specs(X, shap_values, all_predictors,
+                               "images/SHAP2/shap_scatter_plots_heat")
+    specs.append(beeswarm_spec(shap_values, X, all_predictors, "images/SHAP2/beeswarm_heat.png"))
+    specs.append(importance_spec(shap_df, "images/SHAP2/SHAP_importance_heat.png"))
+    specs.append(histogram_spec(df, env_cols, "images/EDA/environment_histogram.png"))
+    specs.append(map_spec(tracts, env_cols, "images/EDA/environment_map.png"))
+    render(specs)
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import struct
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+# Configuration.
+HASH_KEY = "spec-hash"
+DPI = 200
+MAX_WORKERS = os.cpu_count() or 1
+
+PLOTTERS = {}
+
+
+def register(func):
+    """Make a plot function available to specs by name."""
+    PLOTTERS[func.__name__] = func
+    return func
+
+
+class FigureSpec:
+    """One figure: output path, plot function name, data and parameters."""
+
+    def __init__(self, path, plotter, data=None, params=None, figsize=None, ncols=1):
+        self.path = Path(path)
+        self.plotter = plotter
+        self.data = data or {}
+        self.params = params or {}
+        self.figsize = figsize
+        self.ncols = ncols
+
+    def digest(self):
+        h = hashlib.sha1()
+        h.update(self.plotter.encode())
+        h.update(inspect.getsource(PLOTTERS[self.plotter]).encode())
+        h.update(json.dumps([self.params, self.figsize, self.ncols], sort_keys=True, default=str).encode())
+        for key in sorted(self.data):
+            value = np.asarray(self.data[key])
+            h.update(key.encode())
+            h.update(str(value.dtype).encode())
+            h.update(str(value.shape).encode())
+            if value.dtype == object and all(isinstance(v, bytes) for v in value.flat):
+                # WKB geometries.
+                h.update(b"".join(value.flat))
+            elif value.dtype == object:
+                h.update(json.dumps(value.tolist(), default=str).encode())
+            else:
+                h.update(np.ascontiguousarray(value).tobytes())
+        return h.hexdigest()
+
+
+# PNG metadata.
+def png_text(path):
+    """tEXt chunks of a PNG as a dict (stdlib only)."""
+    text = {}
+    try:
+        with open(path, "rb") as f:
+            if f.read(8) != b"\x89PNG\r\n\x1a\n":
+                return text
+            while True:
+                header = f.read(8)
+                if len(header) < 8:
+                    break
+                length, ctype = struct.unpack(">I4s", header)
+                body = f.read(length)
+                f.read(4)
+                if ctype == b"tEXt":
+                    key, _, value = body.partition(b"\x00")
+                    text[key.decode("latin-1")] = value.decode("latin-1")
+                elif ctype == b"zTXt":
+                    key, _, rest = body.partition(b"\x00")
+                    text[key.decode("latin-1")] = zlib.decompress(rest[1:]).decode("latin-1")
+                elif ctype == b"IDAT":
+                    break
+    except FileNotFoundError:
+        pass
+    return text
+
+
+def is_current(spec, digest=None):
+    """True if the existing PNG was rendered from this exact spec."""
+    return png_text(spec.path).get(HASH_KEY) == (digest or spec.digest())
+
+
+# Plot functions.
+@register
+def shap_scatter(ax, x, shap, feature, alpha=0.45):
+    """SHAP value against feature value, as in 07_ols_ml.ipynb."""
+    ax.scatter(x, shap, alpha=alpha)
+    ax.set_xlabel(feature, fontsize=12)
+    ax.set_ylabel(f"SHAP value for {feature}", fontsize=12)
+    ax.set_title(f"SHAP Scatter Plot for {feature}", fontsize=14)
+    ax.grid(True)
+
+
+@register
+def importance_bar(ax, feature, importance, percentage, title="SHAP Feature Importance (with percentage)"):
+    """Horizontal mean |SHAP| bars labelled with percentage share."""
+    ax.barh(feature, importance, color="steelblue")
+    ax.set_xlabel("Mean |SHAP value|", fontsize=12)
+    ax.set_title(title, fontsize=14)
+    offset = np.max(importance) * 0.01
+    for i, (value, pct) in enumerate(zip(importance, percentage)):
+        ax.text(value + offset, i, f"{pct:.1f}%", va="center", fontsize=10)
+    ax.invert_yaxis()
+
+
+@register
+def histogram(ax, values, bins=40, xlabel="", ylabel="Frequency", title=""):
+    """Plain histogram, as used for the EDA target and feature plots."""
+    ax.hist(values[~np.isnan(values)], bins=bins)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    if title:
+        ax.set_title(title)
+
+
+@register
+def histograms(axes, values, labels, bins=40, ylabel="Frequency"):
+    """One histogram per column of values, side by side (EDA *_histogram.png)."""
+    axes = np.atleast_1d(axes)
+    for ax, column, label in zip(axes, np.asarray(values, dtype=np.float64).T, labels):
+        ax.hist(column[~np.isnan(column)], bins=bins)
+        ax.set_xlabel(label)
+        ax.set_ylabel(ylabel)
+        ax.set_title(label)
+
+
+def _summary_text(values):
+    values = values[~np.isnan(values)]
+    return (f"count:  {len(values)}\n"
+            f"mean:   {values.mean():.2f}\n"
+            f"median: {np.median(values):.2f}\n"
+            f"std:    {values.std(ddof=1):.2f}\n"
+            f"min:    {values.min():.2f}\n"
+            f"max:    {values.max():.2f}")
+
+
+@register
+def choropleth(axes, geometry, values, labels, boundaries=None, cmap="OrRd",
+               legend_label="", stats=True):
+    """
+    Tract maps, one per column of values, sharing class breaks and one
+    colorbar, with a summary box per map as in 06_data_merge_cleaning.ipynb.
+    boundaries default to deciles of all the values.
+    """
+    import geopandas as gpd
+    import matplotlib.pyplot as plt
+    import shapely
+    from matplotlib.colors import BoundaryNorm
+
+    axes = np.atleast_1d(axes)
+    values = np.asarray(values, dtype=np.float64).reshape(len(geometry), -1)
+    gdf = gpd.GeoDataFrame(geometry=shapely.from_wkb(np.asarray(geometry, dtype=object)))
+    if boundaries is None:
+        finite = values[~np.isnan(values)]
+        boundaries = np.unique(np.quantile(finite, np.linspace(0, 1, 11)))
+    cmap = plt.get_cmap(cmap)
+    norm = BoundaryNorm(boundaries, ncolors=cmap.N)
+
+    for k, (ax, label) in enumerate(zip(axes, labels)):
+        gdf.assign(value=values[:, k]).plot(
+            column="value", cmap=cmap, norm=norm, linewidth=0, ax=ax, legend=False,
+            missing_kwds={"color": "lightgrey"},
+        )
+        ax.set_title(label)
+        ax.axis("off")
+        if stats:
+            ax.text(0.02, 0.98, _summary_text(values[:, k]), transform=ax.transAxes,
+                    fontsize=9, va="top", ha="left",
+                    bbox=dict(facecolor="white", edgecolor="black", alpha=0.8))
+
+    sm = plt.cm.ScalarMappable(norm=norm, cmap=cmap)
+    sm.set_array([])
+    cbar = axes[0].figure.colorbar(sm, ax=axes.ravel().tolist(), fraction=0.03, pad=0.02,
+                                   ticks=boundaries)
+    cbar.set_ticklabels([f"{b:.1f}" for b in boundaries])
+    cbar.set_label(legend_label)
+
+
+@register
+def shap_beeswarm(ax, values, X, feature_names):
+    """shap.summary_plot beeswarm drawn onto the current figure."""
+    import matplotlib.pyplot as plt
+    import shap
+
+    plt.sca(ax)
+    shap.summary_plot(values, X, feature_names=list(feature_names), show=False)
+
+
+# Rendering.
+def _init_worker():
+    import matplotlib
+    matplotlib.use("Agg")
+
+
+def _render_one(spec, digest, figsize, dpi):
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(1, spec.ncols, figsize=spec.figsize or figsize)
+    PLOTTERS[spec.plotter](ax, **spec.data, **spec.params)
+    spec.path.parent.mkdir(parents=True, exist_ok=True)
+    fig.savefig(spec.path, dpi=dpi, bbox_inches="tight", metadata={HASH_KEY: digest})
+    plt.close(fig)
+    return str(spec.path)
+
+
+def render(specs, figsize=(8, 6), dpi=DPI, max_workers=MAX_WORKERS, force=False):
+    """
+    Render every spec whose PNG is missing or out of date.
+
+    Returns (rendered paths, skipped paths).
+    """
+    todo, skipped = [], []
+    for spec in specs:
+        digest = spec.digest()
+        if not force and is_current(spec, digest):
+            skipped.append(str(spec.path))
+        else:
+            todo.append((spec, digest))
+
+    rendered = []
+    if todo:
+        with ProcessPoolExecutor(min(max_workers, len(todo)), initializer=_init_worker) as pool:
+            futures = [pool.submit(_render_one, spec, digest, figsize, dpi)
+                       for spec, digest in todo]
+            rendered = [f.result() for f in futures]
+
+    print(f"Rendered {len(rendered)} figures, skipped {len(skipped)} unchanged.")
+    return rendered, skipped
+
+
+# Spec builders.
+def shap_scatter_specs(X, shap_values, feature_names, out_dir, alpha=0.45):
+    """One scatter spec per feature, named like the existing PNGs."""
+    X = np.asarray(X, dtype=np.float64)
+    shap_values = np.asarray(shap_values)
+    specs = []
+    for idx, feature in enumerate(feature_names):
+        safe_name = feature.replace("/", "_").replace(" ", "_")
+        specs.append(FigureSpec(
+            Path(out_dir) / f"{safe_name}.png",
+            "shap_scatter",
+            data={"x": X[:, idx], "shap": shap_values[:, idx]},
+            params={"feature": feature, "alpha": alpha},
+        ))
+    return specs
+
+
+def importance_spec(shap_df, path, title="SHAP Feature Importance (with percentage)"):
+    """Percentage importance bar chart from a feature/importance/percentage frame."""
+    return FigureSpec(
+        path,
+        "importance_bar",
+        data={
+            "feature": shap_df["feature"].to_numpy(dtype=object),
+            "importance": shap_df["importance"].to_numpy(),
+            "percentage": shap_df["percentage"].to_numpy(),
+        },
+        params={"title": title},
+        figsize=(8, 10),
+    )
+
+
+def beeswarm_spec(shap_values, X, feature_names, path):
+    """SHAP summary beeswarm over all features."""
+    return FigureSpec(
+        path,
+        "shap_beeswarm",
+        data={
+            "values": np.asarray(shap_values, dtype=np.float64),
+            "X": np.asarray(X, dtype=np.float64),
+            "feature_names": np.asarray(list(feature_names), dtype=object),
+        },
+        figsize=(8, 8),
+    )
+
+
+def histogram_spec(df, columns, path, labels=None, bins=40):
+    """Side-by-side histograms of several columns in one PNG."""
+    columns = list(columns)
+    return FigureSpec(
+        path,
+        "histograms",
+        data={"values": df[columns].to_numpy(dtype=np.float64)},
+        params={"labels": list(labels or columns), "bins": bins},
+        figsize=(5 * len(columns), 4),
+        ncols=len(columns),
+    )
+
+
+def map_spec(gdf, columns, path, labels=None, boundaries=None, cmap="OrRd", legend_label="",
+             stats=True):
+    """Tract choropleths of several columns of a GeoDataFrame, sharing class breaks."""
+    import shapely
+
+    columns = list(columns)
+    params = {"labels": list(labels or columns), "cmap": cmap, "legend_label": legend_label,
+              "stats": stats}
+    if boundaries is not None:
+        params["boundaries"] = [float(b) for b in boundaries]
+    return FigureSpec(
+        path,
+        "choropleth",
+        data={
+            "geometry": shapely.to_wkb(gdf.geometry.to_numpy()),
+            "values": gdf[columns].to_numpy(dtype=np.float64),
+        },
+        params=params,
+        figsize=(8 * len(columns), 7),
+        ncols=len(columns),
+    )
@@ -0,0 +1,238 @@
+"""
+Indexed, parallel reader for NOAA GSOD yearly archives.
+
+Each GSOD year (e.g. 2025.tar.gz) holds one CSV per station. The notebooks
+currently reopen the gzip tarball for every station they read and call
+getmembers() on every baseline year. This module instead:
+
+- builds a station index per archive in one streaming pass (member name,
+  STATION, NAME, LATITUDE, LONGITUDE from each header row) and caches it
+  as JSON next to the archive, keyed by archive size and mtime; on a cold
+  archive that pass also reads the stations requested, so the first run
+  decompresses each archive once;
+- looks requested stations up in that index before extracting, so an
+  archive without any of them is never decompressed, and the streaming
+  pass over one that has them stops at the last indexed member wanted;
+- runs archives on a process pool, so the 1981-2010 baseline is bounded by
+  I/O rather than repeated gzip decompression.
+
+Usage:
+
+    tmax = baseline_tmax("data/History weather station data",
+                         range(1981, 2011), "74486094789")
+    p95 = np.percentile(tmax, 95)
+"""
+
+import csv
+import io
+import json
+import os
+import tarfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Configuration.
+INDEX_SUFFIX = ".index.json"
+MAX_WORKERS = os.cpu_count() or 1
+MISSING_CODES = [9999, 99999, 999.9, 99.9]
+SUMMER_MONTHS = [6, 7, 8]
+
+
+# Index.
+def _station_of(member_name):
+    return Path(member_name).stem
+
+
+def _archive_stamp(archive):
+    st = Path(archive).stat()
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _header_row(f):
+    """First data row of a GSOD CSV as a dict, without pandas."""
+    text = io.TextIOWrapper(f, encoding="utf-8", errors="replace", newline="")
+    reader = csv.DictReader(text)
+    return next(reader, None)
+
+
+def _index_entry(name, row):
+    return {
+        "file": name,
+        "STATION": row.get("STATION"),
+        "NAME": row.get("NAME"),
+        "LATITUDE": pd.to_numeric(row.get("LATITUDE"), errors="coerce"),
+        "LONGITUDE": pd.to_numeric(row.get("LONGITUDE"), errors="coerce"),
+    }
+
+
+def _scan(archive, wanted=()):
+    """
+    One streaming pass over an archive: index every station and read the
+    wanted stations (member file stems) in full. Returns (stations, found).
+    """
+    stations, found = [], {}
+    with tarfile.open(archive, "r|gz") as tar:
+        for member in tar:
+            if not member.isfile() or not member.name.endswith(".csv"):
+                continue
+            f = tar.extractfile(member)
+            if f is None:
+                continue
+            station = _station_of(member.name)
+            if station in wanted:
+                data = f.read()
+                row = _header_row(io.BytesIO(data))
+                found[station] = pd.read_csv(io.BytesIO(data), comment="#")
+            else:
+                row = _header_row(f)
+            if row is not None:
+                stations.append(_index_entry(member.name, row))
+    return stations, found
+
+
+def build_index(archive):
+    """Station index for one archive, one streaming pass."""
+    return _scan(archive)[0]
+
+
+def _index_path(archive):
+    archive = Path(archive)
+    return archive.with_name(archive.name + INDEX_SUFFIX)
+
+
+def _cached_index(archive):
+    """The cached index as a DataFrame, or None if missing or stale."""
+    index_path = _index_path(archive)
+    if index_path.exists():
+        cached = json.loads(index_path.read_text())
+        if cached.get("stamp") == _archive_stamp(archive):
+            return pd.DataFrame(cached["stations"])
+    return None
+
+
+def _write_index(archive, stations):
+    for s in stations:
+        for key in ("LATITUDE", "LONGITUDE"):
+            s[key] = None if pd.isna(s[key]) else float(s[key])
+    _index_path(archive).write_text(json.dumps({"stamp": _archive_stamp(archive),
+                                                "stations": stations}))
+    return pd.DataFrame(stations)
+
+
+def load_index(archive, rebuild=False):
+    """Cached station index as a DataFrame; rebuilt if the archive changed."""
+    index = None if rebuild else _cached_index(archive)
+    if index is None:
+        index = _write_index(archive, build_index(archive))
+    return index
+
+
+def load_indexes(archives, max_workers=MAX_WORKERS):
+    """Station indexes for several archives, built in parallel."""
+    archives = [Path(a) for a in archives]
+    with ProcessPoolExecutor(max_workers) as pool:
+        frames = list(pool.map(load_index, archives))
+    return dict(zip(archives, frames))
+
+
+def find_stations(index, name_pattern=None, bbox=None):
+    """Filter an index by NAME regex and/or (min_lat, max_lat, min_lon, max_lon)."""
+    mask = pd.Series(True, index=index.index)
+    if name_pattern is not None:
+        mask &= index["NAME"].str.contains(name_pattern, case=False, na=False)
+    if bbox is not None:
+        min_lat, max_lat, min_lon, max_lon = bbox
+        mask &= index["LATITUDE"].between(min_lat, max_lat)
+        mask &= index["LONGITUDE"].between(min_lon, max_lon)
+    return index[mask]
+
+
+# Extraction.
+def extract_stations(archive, stations):
+    """
+    Read several station CSVs from one archive in a single streaming pass.
+
+    stations are GSOD station IDs (member file stems). Returns
+    {station: DataFrame}. With a warm index, stations absent from it are
+    omitted without reading the archive; without one, the index is built
+    in the same pass that reads the stations.
+    """
+    wanted = {str(s) for s in stations}
+    index = _cached_index(archive)
+    if index is None:
+        index_stations, found = _scan(archive, wanted)
+        _write_index(archive, index_stations)
+        return found
+
+    members = index["file"] if len(index) else []
+    remaining = {m for m in members if _station_of(m) in wanted}
+    found = {}
+    if not remaining:
+        return found
+
+    with tarfile.open(archive, "r|gz") as tar:
+        for member in tar:
+            if member.name not in remaining:
+                continue
+            remaining.discard(member.name)
+            f = tar.extractfile(member)
+            if f is not None:
+                found[_station_of(member.name)] = pd.read_csv(io.BytesIO(f.read()), comment="#")
+            if not remaining:
+                break
+    return found
+
+
+def _extract_job(args):
+    archive, stations = args
+    return archive, extract_stations(archive, stations)
+
+
+def extract_many(archives, stations, max_workers=MAX_WORKERS):
+    """extract_stations over many archives on a process pool."""
+    archives = [Path(a) for a in archives if Path(a).exists()]
+    jobs = [(a, list(stations)) for a in archives]
+    with ProcessPoolExecutor(max_workers) as pool:
+        return dict(pool.map(_extract_job, jobs))
+
+
+# Baseline.
+def summer_tmax(df, months=SUMMER_MONTHS):
+    """Clean daily max temperature (°F) for summer months, as in 01b."""
+    df = df.copy()
+    df.columns = [c.upper() for c in df.columns]
+    if "DATE" not in df.columns:
+        raise ValueError("DATE column not found")
+    df["DATE"] = pd.to_datetime(df["DATE"])
+    df = df[df["DATE"].dt.month.isin(months)]
+
+    temp_col = "MAX" if "MAX" in df.columns else "TMAX" if "TMAX" in df.columns else None
+    if temp_col is None:
+        raise ValueError("MAX/TMAX column not found")
+
+    temps = pd.to_numeric(df[temp_col], errors="coerce").replace(MISSING_CODES, np.nan)
+    return pd.Series(temps.to_numpy(), index=df["DATE"].to_numpy(), name="TMAX_F").dropna()
+
+
+def baseline_tmax(data_dir, years, station, max_workers=MAX_WORKERS):
+    """Summer daily max temperatures for one station over many years."""
+    archives = [Path(data_dir) / f"{year}.tar.gz" for year in years]
+    missing = [a for a in archives if not a.exists()]
+    for a in missing:
+        print(f"[WARN] {a} does not exist, skipped.")
+
+    extracted = extract_many(archives, [station], max_workers)
+    series = []
+    for archive in sorted(extracted):
+        frames = extracted[archive]
+        if str(station) not in frames:
+            print(f"[WARN] {station} not found in {archive}, skipped.")
+            continue
+        series.append(summer_tmax(frames[str(station)]))
+
+    if not series:
+        raise RuntimeError("No valid temperature data found. Check file names and structure.")
+    return pd.concat(series).sort_index()
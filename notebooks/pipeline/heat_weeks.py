@@ -0,0 +1,145 @@
+"""
+Vectorized multi-threshold heat-day and heat-week classification.
+
+01b_extreme_heat_days_filter.ipynb hard-codes one threshold and
+06_data_merge_cleaning.ipynb one heat-week rule (heat_days >= 2). This
+module evaluates a whole grid at once:
+
+- thresholds in °F and/or percentiles of a baseline series;
+- minimum heat days per week.
+
+One pass over the daily series gives a (threshold, min_days) x week matrix
+of heat-week flags. weekly_targets() then builds heatweek_calls_per_1k and
+normalweek_calls_per_1k for every variant from one tract x week call
+matrix, without reloading any data.
+
+Usage:
+
+    from pipeline.gsod import summer_tmax
+
+    daily = summer_tmax(pd.read_csv("data/nyc_two_stations/NYC_JFK_Airport.csv"))
+    flags = heat_week_flags(daily, thresholds_f=[90, 91, 93, 95], min_days=[1, 2, 3])
+    targets = weekly_targets(weekly_calls, acs[["GEOID", "TOTAL_POP"]], flags)
+"""
+
+import numpy as np
+import pandas as pd
+
+from .panel_store import WEEK0_START
+
+# Configuration.
+N_WEEKS = 12   # weeks 0-11; week 12 is incomplete and dropped, as in 06.
+
+
+def threshold_grid(thresholds_f=(), percentiles=(), baseline=None):
+    """
+    Threshold labels and °F values.
+
+    Percentiles are taken from the baseline series (e.g. 1981-2010 JJA
+    daily max), labelled like 'p95'; fixed thresholds are labelled '91F'.
+    """
+    labels, values = [], []
+    for t in thresholds_f:
+        labels.append(f"{t:g}F")
+        values.append(float(t))
+    if percentiles:
+        if baseline is None:
+            raise ValueError("percentile thresholds need a baseline series")
+        for p, v in zip(percentiles, np.percentile(np.asarray(baseline, float), percentiles)):
+            labels.append(f"p{p:g}")
+            values.append(float(v))
+    return labels, np.asarray(values)
+
+
+def week_index(dates, week0_start=WEEK0_START):
+    """Sunday-Saturday week number from week0_start."""
+    return ((pd.to_datetime(dates) - pd.Timestamp(week0_start)).days // 7).to_numpy()
+
+
+def heat_day_counts(daily, thresholds, n_weeks=N_WEEKS, week0_start=WEEK0_START):
+    """
+    (n_thresholds, n_weeks) heat-day counts.
+
+    daily is a Series of daily max °F indexed by date. A day is a heat day
+    when TMAX_F >= threshold.
+    """
+    daily = daily.dropna()
+    weeks = week_index(daily.index, week0_start)
+    keep = (weeks >= 0) & (weeks < n_weeks)
+    temps = daily.to_numpy()[keep]
+    weeks = weeks[keep]
+
+    exceed = temps[None, :] >= np.asarray(thresholds)[:, None]       # thresholds x days
+    onehot = np.zeros((len(weeks), n_weeks), dtype=np.int16)         # days x weeks
+    onehot[np.arange(len(weeks)), weeks] = 1
+    return exceed.astype(np.int16) @ onehot
+
+
+def heat_week_flags(daily, thresholds_f=(), percentiles=(), baseline=None,
+                    min_days=(2,), n_weeks=N_WEEKS, week0_start=WEEK0_START):
+    """
+    Heat-week flags for every (threshold, min_days) variant.
+
+    Returns an int8 DataFrame indexed by (threshold, threshold_f, min_days)
+    with one column per week; 1 marks a heat week.
+    """
+    labels, values = threshold_grid(thresholds_f, percentiles, baseline)
+    counts = heat_day_counts(daily, values, n_weeks, week0_start)
+    rules = np.asarray(min_days)
+
+    flags = (counts[:, None, :] >= rules[None, :, None]).astype(np.int8)
+    index = pd.MultiIndex.from_product(
+        [range(len(labels)), rules], names=["_t", "min_days"]
+    )
+    out = pd.DataFrame(flags.reshape(-1, n_weeks), index=index,
+                       columns=pd.RangeIndex(n_weeks, name="week"))
+
+    t = out.index.get_level_values("_t")
+    out.index = pd.MultiIndex.from_arrays(
+        [np.asarray(labels)[t], values[t], out.index.get_level_values("min_days")],
+        names=["threshold", "threshold_f", "min_days"],
+    )
+    return out
+
+
+def weekly_targets(weekly_calls, population, flags, geoid_col="GEOID",
+                   pop_col="TOTAL_POP"):
+    """
+    Heat-week and normal-week QoL call rates for every flag variant.
+
+    weekly_calls has GEOID, week, weekly_qol_calls (as built in 06 or read
+    from PanelStore.read_weekly). As in 06, a tract's average only covers
+    the weeks it appears in, and tracts missing either average or a
+    population are dropped. Returns one row per (variant, GEOID).
+    """
+    n_weeks = flags.shape[1]
+    wc = weekly_calls[(weekly_calls["week"] >= 0) & (weekly_calls["week"] < n_weeks)]
+
+    calls = wc.pivot_table(index=geoid_col, columns="week", values="weekly_qol_calls",
+                           aggfunc="sum").reindex(columns=range(n_weeks))
+    present = calls.notna().to_numpy(dtype=np.float64)           # tracts x weeks
+    c = calls.fillna(0).to_numpy(dtype=np.float64)
+
+    heat = flags.to_numpy(dtype=np.float64).T                       # weeks x variants
+    normal = 1.0 - heat
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        heat_avg = (c @ heat) / (present @ heat)                    # tracts x variants
+        normal_avg = (c @ normal) / (present @ normal)
+
+    pop = (population.drop_duplicates(geoid_col).set_index(geoid_col)[pop_col]
+           .reindex(calls.index).to_numpy(dtype=np.float64))
+
+    n_tracts, n_variants = heat_avg.shape
+    out = pd.DataFrame({
+        geoid_col: np.tile(calls.index.to_numpy(), n_variants),
+        "heatweek_avg_qol_calls": heat_avg.T.ravel(),
+        "normalweek_avg_qol_calls": normal_avg.T.ravel(),
+        pop_col: np.tile(pop, n_variants),
+    })
+    variants = flags.index.to_frame(index=False).loc[np.repeat(np.arange(n_variants), n_tracts)]
+    out = pd.concat([variants.reset_index(drop=True), out], axis=1)
+
+    out["heatweek_calls_per_1k"] = out["heatweek_avg_qol_calls"] / out[pop_col] * 1000
+    out["normalweek_calls_per_1k"] = out["normalweek_avg_qol_calls"] / out[pop_col] * 1000
+    return out.dropna(subset=["heatweek_avg_qol_calls", "normalweek_avg_qol_calls", pop_col])
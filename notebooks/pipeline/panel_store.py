@@ -0,0 +1,213 @@
+"""
+Incremental, date-partitioned store for the tract-day 311 panel.
+
+Replaces the single nyc_311_tract_day_2025.csv with one Parquet partition
+per day plus weekly rollups. Ingesting a new batch of tract-assigned calls
+aggregates only the days it contains and refreshes only the weeks those
+days fall in. Downstream steps read just the days or weeks they need.
+
+Each day also keeps the calls it was aggregated from (unique_key, GEOID,
+created_date, is_heat_qol). A batch is merged with them and de-duplicated
+on unique_key before the day is re-aggregated, so batches may overlap or
+split a day without dropping or double-counting calls.
+
+Layout on disk:
+
+    data/nyc_311/panel/
+        calls/2025-06-01.parquet     unique_key, GEOID, created_date, is_heat_qol
+        daily/2025-06-01.parquet     GEOID, DATE, TOTAL_CALLS, QOL_CALLS, ...
+        weekly/week_00.parquet       GEOID, week, weekly_qol_calls, ...
+        _manifest.json               week0 start and ingested days
+
+Week numbering matches 06_data_merge_cleaning.ipynb: week 0 starts on the
+Sunday 2025-06-01 and every week runs Sunday-Saturday.
+"""
+
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Configuration.
+WEEK0_START = "2025-06-01"
+MANIFEST_NAME = "_manifest.json"
+CALL_COLS = ["unique_key", "GEOID", "created_date", "is_heat_qol"]
+
+
+def build_daily_panel(calls):
+    """
+    Aggregate tract-assigned calls to tract by day.
+
+    Expects GEOID, created_date, unique_key and is_heat_qol columns, as in
+    joined_gdf from 02_311_tract_daily.ipynb. Returns the same uppercase
+    columns the notebook writes.
+    """
+    calls = calls.dropna(subset=["GEOID"])
+    calls = calls.assign(date=pd.to_datetime(calls["created_date"]).dt.normalize())
+
+    panel = (
+        calls.groupby(["GEOID", "date"], as_index=False, observed=True)
+        .agg(
+            total_calls=("unique_key", "count"),
+            qol_calls=("is_heat_qol", "sum"),
+        )
+    )
+
+    panel["GEOID"] = panel["GEOID"].astype(str)
+    panel["total_calls"] = panel["total_calls"].astype("int32")
+    panel["qol_calls"] = panel["qol_calls"].astype("int32")
+    panel["heat_qol_rate_1k"] = panel["qol_calls"].astype(float)
+    panel["qol_pct"] = np.where(
+        panel["total_calls"] > 0,
+        panel["qol_calls"] / panel["total_calls"],
+        np.nan
+    )
+
+    panel.columns = panel.columns.str.upper()
+    return panel
+
+
+class PanelStore:
+    """Day-partitioned tract panel with weekly QoL rollups."""
+
+    def __init__(self, root, week0_start=WEEK0_START):
+        self.root = Path(root)
+        self.calls_dir = self.root / "calls"
+        self.daily_dir = self.root / "daily"
+        self.weekly_dir = self.root / "weekly"
+        for directory in (self.calls_dir, self.daily_dir, self.weekly_dir):
+            directory.mkdir(parents=True, exist_ok=True)
+
+        self.manifest = self._read_manifest()
+        self.manifest.setdefault("week0_start", str(pd.Timestamp(week0_start).date()))
+        self.manifest.setdefault("days", {})
+        self.week0_start = pd.Timestamp(self.manifest["week0_start"])
+
+    # Manifest.
+    def _read_manifest(self):
+        path = self.root / MANIFEST_NAME
+        if path.exists():
+            return json.loads(path.read_text())
+        return {}
+
+    def _write_manifest(self):
+        path = self.root / MANIFEST_NAME
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.manifest, indent=2, sort_keys=True))
+        os.replace(tmp, path)
+
+    # Paths.
+    def _calls_path(self, day):
+        return self.calls_dir / f"{pd.Timestamp(day):%Y-%m-%d}.parquet"
+
+    def _day_path(self, day):
+        return self.daily_dir / f"{pd.Timestamp(day):%Y-%m-%d}.parquet"
+
+    def _week_path(self, week):
+        return self.weekly_dir / f"week_{int(week):02d}.parquet"
+
+    def week_of(self, dates):
+        """Week index (Sunday-Saturday) for a date or DatetimeIndex."""
+        return (pd.to_datetime(dates) - self.week0_start).days // 7
+
+    def days(self):
+        """Ingested days, sorted."""
+        return sorted(pd.Timestamp(d) for d in self.manifest["days"])
+
+    # Ingest.
+    def ingest(self, calls, replace=False):
+        """
+        Add tract-assigned calls to the store.
+
+        Only days in this batch are aggregated. Each day's stored calls are
+        merged with the batch's and de-duplicated on unique_key; a call in
+        both keeps the stored version, or the batch's with replace=True
+        (e.g. a corrected GEOID). Days the batch adds nothing to are left
+        alone. Returns the list of days written.
+        """
+        calls = calls.dropna(subset=["GEOID"]).loc[:, CALL_COLS]
+        calls = calls.assign(
+            unique_key=calls["unique_key"].astype(str),
+            GEOID=calls["GEOID"].astype(str),
+            created_date=pd.to_datetime(calls["created_date"]),
+        )
+        written = []
+
+        for day, batch in calls.groupby(calls["created_date"].dt.normalize(), sort=True):
+            key = f"{day:%Y-%m-%d}"
+            calls_path = self._calls_path(day)
+            if calls_path.exists():
+                stored = pd.read_parquet(calls_path)
+                merged = pd.concat([stored, batch], ignore_index=True)
+                merged = merged.drop_duplicates("unique_key", keep="last" if replace else "first")
+                if not replace and len(merged) == len(stored):
+                    continue
+            elif key in self.manifest["days"]:
+                raise ValueError(f"{key} was stored without its calls; rebuild the store to merge into it.")
+            else:
+                merged = batch.drop_duplicates("unique_key", keep="last")
+
+            merged = merged.sort_values("unique_key", ignore_index=True)
+            day_panel = build_daily_panel(merged)
+            merged.to_parquet(calls_path, index=False)
+            day_panel.to_parquet(self._day_path(day), index=False)
+            self.manifest["days"][key] = int(len(day_panel))
+            written.append(day)
+
+        if written:
+            self._write_manifest()
+            self.refresh_weeks(sorted(set(self.week_of(pd.DatetimeIndex(written)))))
+        return written
+
+    def refresh_weeks(self, weeks):
+        """Rebuild weekly rollups from the daily partitions of these weeks."""
+        for week in weeks:
+            start = self.week0_start + pd.Timedelta(days=7 * int(week))
+            end = start + pd.Timedelta(days=6)
+            daily = self.read_daily(start, end, columns=["GEOID", "TOTAL_CALLS", "QOL_CALLS"])
+            if daily.empty:
+                continue
+
+            weekly = (
+                daily.groupby("GEOID", as_index=False)
+                .agg(
+                    weekly_total_calls=("TOTAL_CALLS", "sum"),
+                    weekly_qol_calls=("QOL_CALLS", "sum"),
+                )
+            )
+            weekly.insert(1, "week", np.int16(week))
+            weekly["n_days"] = np.int8(self._days_in(start, end))
+            weekly.to_parquet(self._week_path(week), index=False)
+
+    def _days_in(self, start, end):
+        return sum(start <= d <= end for d in self.days())
+
+    # Read.
+    def read_daily(self, start=None, end=None, columns=None):
+        """Daily panel for days in [start, end], reading only those partitions."""
+        days = self.days()
+        if start is not None:
+            days = [d for d in days if d >= pd.Timestamp(start)]
+        if end is not None:
+            days = [d for d in days if d <= pd.Timestamp(end)]
+        frames = [pd.read_parquet(self._day_path(d), columns=columns) for d in days]
+        if not frames:
+            return pd.DataFrame(columns=columns)
+        return pd.concat(frames, ignore_index=True)
+
+    def read_weekly(self, weeks=None, columns=None):
+        """Weekly rollups for the requested week indices (all if None)."""
+        if weeks is None:
+            paths = sorted(self.weekly_dir.glob("week_*.parquet"))
+        else:
+            paths = [self._week_path(w) for w in weeks if self._week_path(w).exists()]
+        frames = [pd.read_parquet(p, columns=columns) for p in paths]
+        if not frames:
+            return pd.DataFrame(columns=columns)
+        return pd.concat(frames, ignore_index=True)
+
+    def to_csv(self, path):
+        """Write the full daily panel in the original CSV layout."""
+        self.read_daily().to_csv(path, index=False)
@@ -0,0 +1,394 @@
+"""
+Per-stage profiling for the notebook pipeline and the site build scripts.
+
+stage() is a context manager and profiled() a decorator. Each stage records
+wall time, CPU time, peak RSS and, when told, rows and bytes in and out.
+A stage opened inside another on the same thread is recorded as its
+sub-step.
+
+    from pipeline import profiling
+
+    profiling.enable("cache/profile/trace.json")
+
+    with profiling.stage("311 sjoin") as s:
+        s.input(calls)
+        codes = index.assign(calls.longitude, calls.latitude)
+        s.output(codes)
+
+    @profiling.profiled("zonal stats", input_arg="tracts")
+    def zonal_stats(tracts, ...): ...
+
+    profiling.report()    # one line per stage; writes the trace
+
+The trace is Chrome trace-event JSON (chrome://tracing, ui.perfetto.dev).
+
+Profiling is off until enable() is called, or PIPELINE_PROFILE names a
+directory (then each process writes trace-<pid>.json there on exit; see
+`python -m pipeline.runner --profile`). While off, stage() returns one
+shared no-op object and profiled() functions make a single attribute check
+before calling through.
+
+Pool workers exit through os._exit, which skips atexit, so a worker
+process (forked from a profiled parent, or a multiprocessing child started
+with PIPELINE_PROFILE set) writes its own trace-<pid>.json beside the
+parent's after every top-level stage it finishes. A forked worker starts
+with none of the parent's events or open stages. merge_traces() combines
+the files.
+
+What is measured:
+
+- CPU is this process plus child processes that have finished, so process
+  pools that shut down inside a stage are counted.
+- Peak RSS is per stage on Linux, where the kernel's high-water mark can
+  be reset through /proc/self/clear_refs; elsewhere it is the process
+  high-water mark when the stage ends. Either way it is process-wide, so
+  stages running on concurrent threads share it.
+- Rows are len() of a frame, array or sequence; bytes are the in-memory
+  size (nbytes / shallow memory_usage) or, for a path, the size on disk.
+"""
+
+import atexit
+import functools
+import inspect
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Configuration.
+ENV_VAR = "PIPELINE_PROFILE"
+CLEAR_REFS = Path("/proc/self/clear_refs")
+PROC_STATUS = Path("/proc/self/status")
+# ru_maxrss is in kilobytes on Linux and bytes on macOS.
+MAXRSS_UNIT = 1 if sys.platform == "darwin" else 1024
+
+
+# Measurements.
+def measure(obj):
+    """(rows, bytes) of a DataFrame, array, sequence, bytes or path; None where unknown."""
+    if obj is None:
+        return None, None
+    if isinstance(obj, os.PathLike):
+        path = Path(obj)
+        if path.is_dir():
+            return None, sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+        return None, path.stat().st_size if path.exists() else None
+    if isinstance(obj, (bytes, bytearray)):
+        return None, len(obj)
+    if isinstance(obj, str):
+        return None, len(obj.encode())
+
+    shape = getattr(obj, "shape", None)
+    rows = shape[0] if shape else (len(obj) if hasattr(obj, "__len__") else None)
+    nbytes = None
+    if hasattr(obj, "memory_usage"):
+        usage = obj.memory_usage(index=True, deep=False)
+        nbytes = int(usage.sum()) if hasattr(usage, "sum") else int(usage)
+    elif hasattr(obj, "nbytes"):
+        nbytes = int(obj.nbytes)
+    return rows, nbytes
+
+
+def _cpu_seconds():
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+def _reset_peak():
+    """Reset the kernel's RSS high-water mark; False where that is not possible."""
+    try:
+        with open(CLEAR_REFS, "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss(resettable):
+    """RSS high-water mark in bytes (since the last reset when resettable)."""
+    if resettable:
+        with open(PROC_STATUS) as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * MAXRSS_UNIT
+
+
+# Stages.
+class Stage:
+    """One running stage; counts are added with input() and output()."""
+
+    def __init__(self, profiler, name, cat, counts):
+        self.profiler = profiler
+        self.name = name
+        self.cat = cat
+        self.counts = {k: v for k, v in counts.items() if v is not None}
+        self.parent = None
+        self.depth = 0
+        self.peak = 0
+        self.t0 = self.cpu0 = None
+
+    def _add(self, direction, obj, rows, nbytes):
+        if obj is not None:
+            measured_rows, measured_bytes = measure(obj)
+            rows = measured_rows if rows is None else rows
+            nbytes = measured_bytes if nbytes is None else nbytes
+        for key, value in ((f"rows_{direction}", rows), (f"bytes_{direction}", nbytes)):
+            if value is not None:
+                self.counts[key] = self.counts.get(key, 0) + int(value)
+        return self
+
+    def input(self, obj=None, rows=None, nbytes=None):
+        return self._add("in", obj, rows, nbytes)
+
+    def output(self, obj=None, rows=None, nbytes=None):
+        return self._add("out", obj, rows, nbytes)
+
+    def __enter__(self):
+        self.profiler._enter(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.profiler._exit(self, exc_type)
+        return False
+
+
+class _NullStage:
+    """Stand-in while profiling is off."""
+
+    def input(self, obj=None, rows=None, nbytes=None):
+        return self
+
+    def output(self, obj=None, rows=None, nbytes=None):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NULL_STAGE = _NullStage()
+
+
+class Profiler:
+    """Collects finished stages as Chrome trace events."""
+
+    def __init__(self):
+        self.enabled = False
+        self.trace_path = None
+        self.events = []
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.origin = time.perf_counter()
+        self.epoch = time.time()
+        self.resettable = False
+        self.threads = {}
+        # Worker processes write their trace after each top-level stage.
+        self.flush_stages = False
+
+    def enable(self, trace_path=None):
+        self.trace_path = Path(trace_path) if trace_path else None
+        self.events = []
+        self.origin = time.perf_counter()
+        self.epoch = time.time()
+        self.resettable = _reset_peak()
+        self.enabled = True
+
+    def _after_fork(self):
+        """In a forked child: drop the parent's events and open stages, trace to trace-<pid>.json."""
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.events = []
+        self.threads = {}
+        if self.enabled and self.trace_path is not None:
+            self.trace_path = self.trace_path.with_name(f"trace-{os.getpid()}.json")
+            self.flush_stages = True
+
+    def _stack(self):
+        stack = getattr(self.local, "stack", None)
+        if stack is None:
+            stack = self.local.stack = []
+        return stack
+
+    def _enter(self, stage):
+        stack = self._stack()
+        if stack:
+            stage.parent = stack[-1]
+            stage.depth = stage.parent.depth + 1
+            # Fold the parent's peak so far in before the mark is reset.
+            stage.parent.peak = max(stage.parent.peak, _peak_rss(self.resettable))
+        if self.resettable:
+            _reset_peak()
+        stack.append(stage)
+        stage.cpu0 = _cpu_seconds()
+        stage.t0 = time.perf_counter()
+
+    def _exit(self, stage, exc_type=None):
+        t1 = time.perf_counter()
+        cpu = _cpu_seconds() - stage.cpu0
+        stage.peak = max(stage.peak, _peak_rss(self.resettable))
+        stack = self._stack()
+        if stack and stack[-1] is stage:
+            stack.pop()
+        if stage.parent is not None:
+            stage.parent.peak = max(stage.parent.peak, stage.peak)
+
+        args = {
+            "wall_s": round(t1 - stage.t0, 6),
+            "cpu_s": round(cpu, 6),
+            "peak_rss_mb": round(stage.peak / 2**20, 1),
+            "depth": stage.depth,
+            **stage.counts,
+        }
+        if stage.parent is not None:
+            args["parent"] = stage.parent.name
+        if exc_type is not None:
+            args["error"] = exc_type.__name__
+
+        with self.lock:
+            tid = self.threads.setdefault(threading.get_ident(), len(self.threads))
+            self.events.append({
+                "name": stage.name,
+                "cat": stage.cat,
+                "ph": "X",
+                # Wall-clock timestamps line up traces from several processes.
+                "ts": round((self.epoch + stage.t0 - self.origin) * 1e6, 1),
+                "dur": round((t1 - stage.t0) * 1e6, 1),
+                "pid": os.getpid(),
+                "tid": tid,
+                "args": args,
+            })
+        if self.flush_stages and stage.depth == 0:
+            self.write_trace()
+
+    def write_trace(self, path=None):
+        path = Path(path or self.trace_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self.lock:
+            events = sorted(self.events, key=lambda e: e["ts"])
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"traceEvents": events, "displayTimeUnit": "ms"}))
+        os.replace(tmp, path)
+        return path
+
+
+PROFILER = Profiler()
+
+
+# Public API.
+def enable(trace_path=None):
+    """Start recording; report() writes the trace to trace_path if given."""
+    PROFILER.enable(trace_path)
+
+
+def disable():
+    PROFILER.enabled = False
+
+
+def stage(name, cat="stage", **counts):
+    """Context manager timing one stage; counts are rows_in/rows_out/bytes_in/bytes_out."""
+    if not PROFILER.enabled:
+        return NULL_STAGE
+    return Stage(PROFILER, name, cat, counts)
+
+
+def current():
+    """The innermost running stage on this thread (a no-op object if none)."""
+    stack = getattr(PROFILER.local, "stack", None) if PROFILER.enabled else None
+    return stack[-1] if stack else NULL_STAGE
+
+
+def profiled(name=None, input_arg=None, output=True, cat="stage"):
+    """
+    Decorator form of stage(). input_arg names a parameter to measure as the
+    stage's input; with output=True the return value is measured as its output.
+    """
+    def decorate(func):
+        stage_name = name or func.__qualname__
+        signature = inspect.signature(func) if input_arg else None
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not PROFILER.enabled:
+                return func(*args, **kwargs)
+            with Stage(PROFILER, stage_name, cat, {}) as s:
+                if input_arg:
+                    s.input(signature.bind_partial(*args, **kwargs).arguments.get(input_arg))
+                result = func(*args, **kwargs)
+                if output:
+                    s.output(result)
+                return result
+        return wrapper
+    return decorate
+
+
+# Reports.
+def _fmt_count(value, scale=1, digits=0):
+    return "" if value is None else f"{value / scale:,.{digits}f}"
+
+
+def summary(events=None):
+    """One line per stage, in start order, sub-steps indented under their parent."""
+    if events is None:
+        with PROFILER.lock:
+            events = list(PROFILER.events)
+    events = sorted(events, key=lambda e: (e["pid"], e["ts"]))
+    header = (f"{'stage':<40} {'wall s':>9} {'cpu s':>9} {'peak MB':>9} "
+              f"{'rows in':>12} {'rows out':>12} {'MB in':>9} {'MB out':>9}")
+    lines = [header]
+    for e in events:
+        a = e["args"]
+        label = "  " * a.get("depth", 0) + e["name"]
+        if "error" in a:
+            label += f" ({a['error']})"
+        lines.append(
+            f"{label[:40]:<40} {a['wall_s']:>9.3f} {a['cpu_s']:>9.3f} {a['peak_rss_mb']:>9.1f} "
+            f"{_fmt_count(a.get('rows_in')):>12} {_fmt_count(a.get('rows_out')):>12} "
+            f"{_fmt_count(a.get('bytes_in'), 2**20, 2):>9} {_fmt_count(a.get('bytes_out'), 2**20, 2):>9}"
+        )
+    return "\n".join(lines)
+
+
+def report(trace_path=None):
+    """Print the summary and write the trace (to trace_path or the enable() path)."""
+    text = summary()
+    print(text)
+    path = trace_path or PROFILER.trace_path
+    if path:
+        path = PROFILER.write_trace(path)
+        print(f"Trace: {path} ({len(PROFILER.events)} events).")
+    return text
+
+
+def merge_traces(trace_dir, out_path):
+    """Combine the per-process traces in trace_dir into one file; returns its events."""
+    events = []
+    for path in sorted(Path(trace_dir).glob("trace-*.json")):
+        events.extend(json.loads(path.read_text())["traceEvents"])
+    events.sort(key=lambda e: (e["pid"], e["ts"]))
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    out_path.write_text(json.dumps({"traceEvents": events, "displayTimeUnit": "ms"}))
+    return events
+
+
+# Enabled from the environment: write this process's trace on exit.
+def _write_on_exit():
+    if PROFILER.enabled and PROFILER.events:
+        PROFILER.write_trace()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=PROFILER._after_fork)
+
+if os.environ.get(ENV_VAR):
+    enable(Path(os.environ[ENV_VAR]) / f"trace-{os.getpid()}.json")
+    # A spawned pool worker imports this module afresh; it may never reach atexit.
+    PROFILER.flush_stages = multiprocessing.parent_process() is not None
+    atexit.register(_write_on_exit)
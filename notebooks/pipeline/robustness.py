@@ -0,0 +1,273 @@
+"""
+Seed- and split-robustness sweep for the Random Forest results.
+
+The RF metrics in the report (R² 0.2738 normal, 0.2458 extreme heat) come
+from a single train_test_split(random_state=42). This runner refits the
+tuned forests over many random seeds and over spatially blocked folds
+(leave-one-borough-out, or finer GEOID-prefix blocks):
+
+- the feature matrix, the log1p targets and the block labels are written
+  once as .npy files under cache/robustness/ and opened read-only with
+  mmap_mode="r" in each worker's initializer, so tasks share the same
+  pages instead of each re-reading Final_Data_Model.csv or copying X;
+- a task is just (target, scheme, seed, fold); workers rebuild the split
+  indices from those scalars;
+- every finished fit is appended to a JSON-lines results file as it
+  completes, so an interrupted sweep resumes where it stopped (a row cut
+  short by the interruption is dropped and re-run). Rows carry
+  a sweep id, the sha1 of the shared arrays and the sweep settings, so
+  rows from other data or settings never count as done.
+
+summarize() gives the R²/RMSE/MAE distributions per target and split
+scheme; feature_ranks() gives mean-|SHAP| rankings across runs.
+
+Usage:
+
+    arrays = share_arrays(df, all_predictors)
+    results = run_sweep(arrays, seeds=range(50), schemes=("random", "borough"))
+    summarize(results)
+    feature_ranks(results)
+"""
+
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from sklearn.model_selection import GroupKFold, train_test_split
+
+# Configuration.
+SHARED_DIR = Path("cache/robustness")
+TARGETS = ["heatweek_calls_per_1k", "normalweek_calls_per_1k"]
+
+# Best parameters from the grid searches in 07_ols_ml.ipynb.
+RF_PARAMS = {
+    "heatweek_calls_per_1k": {"max_depth": 30, "max_features": 0.5, "min_samples_leaf": 4,
+                              "min_samples_split": 2, "n_estimators": 400},
+    "normalweek_calls_per_1k": {"max_depth": 30, "max_features": 0.5, "min_samples_leaf": 4,
+                                "min_samples_split": 2, "n_estimators": 600},
+}
+
+# Split schemes: random holdout, or blocks from the first N GEOID digits.
+# 5 digits = state + county = borough; 8 digits groups neighbouring tracts.
+SCHEMES = {"random": None, "borough": 5, "tract_block": 8}
+TEST_SIZE = 0.2
+MAX_WORKERS = os.cpu_count() or 1
+
+
+def share_arrays(df, predictors, targets=TARGETS, geoid_col="GEOID", out_dir=SHARED_DIR):
+    """
+    Write X, log1p(Y) and GEOID block labels as .npy files for the workers.
+
+    Returns the directory; names and shapes go into arrays.json.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    arrays = {
+        "X": df[predictors].to_numpy(dtype=np.float64),
+        "Y": np.log1p(df[targets].to_numpy(dtype=np.float64)),
+    }
+    geoid = df[geoid_col].astype(str).str.zfill(11)
+    for scheme, digits in SCHEMES.items():
+        if digits is not None:
+            codes, _ = pd.factorize(geoid.str[:digits])
+            arrays[f"groups_{scheme}"] = codes.astype(np.int32)
+
+    h = hashlib.sha1()
+    for name, array in arrays.items():
+        np.save(out_dir / f"{name}.npy", array)
+        h.update(name.encode())
+        h.update(array.tobytes())
+    h.update(json.dumps([list(predictors), list(targets)]).encode())
+
+    meta = {"predictors": list(predictors), "targets": list(targets), "n_rows": len(df),
+            "digest": h.hexdigest()}
+    (out_dir / "arrays.json").write_text(json.dumps(meta, indent=2))
+    return out_dir
+
+
+# Worker state.
+_X = _Y = None
+_groups = {}
+_meta = None
+
+
+def _init_worker(arrays_dir):
+    global _X, _Y, _meta
+    arrays_dir = Path(arrays_dir)
+    _X = np.load(arrays_dir / "X.npy", mmap_mode="r")
+    _Y = np.load(arrays_dir / "Y.npy", mmap_mode="r")
+    _meta = json.loads((arrays_dir / "arrays.json").read_text())
+    for scheme, digits in SCHEMES.items():
+        if digits is not None:
+            _groups[scheme] = np.load(arrays_dir / f"groups_{scheme}.npy", mmap_mode="r")
+
+
+def split_indices(n_rows, scheme, seed, fold, groups=None, n_folds=5):
+    """(train, test) row indices for one task, rebuilt from scalars."""
+    rows = np.arange(n_rows)
+    if SCHEMES[scheme] is None:
+        return train_test_split(rows, test_size=TEST_SIZE, random_state=seed)
+    n_folds = min(n_folds, len(np.unique(groups)))
+    splits = list(GroupKFold(n_splits=n_folds).split(rows, groups=groups))
+    return splits[fold]
+
+
+def _fit_task(target, scheme, seed, fold, n_folds, with_shap):
+    k = _meta["targets"].index(target)
+    train, test = split_indices(len(_X), scheme, seed, fold, _groups.get(scheme), n_folds)
+    y = _Y[:, k]
+
+    model = RandomForestRegressor(**RF_PARAMS[target], random_state=seed, n_jobs=1)
+    model.fit(_X[train], y[train])
+    pred = model.predict(_X[test])
+
+    row = {
+        "target": target, "scheme": scheme, "seed": seed, "fold": fold,
+        "n_train": len(train), "n_test": len(test),
+        "r2": r2_score(y[test], pred),
+        "rmse": float(np.sqrt(mean_squared_error(y[test], pred))),
+        "mae": mean_absolute_error(y[test], pred),
+    }
+    if with_shap:
+        import shap
+        values = shap.TreeExplainer(model).shap_values(np.asarray(_X[test]))
+        row["mean_abs_shap"] = dict(zip(_meta["predictors"], np.abs(values).mean(axis=0).tolist()))
+    return row
+
+
+def sweep_tasks(seeds, schemes, targets=TARGETS, n_folds=5, n_groups=None):
+    """
+    (target, scheme, seed, fold) tuples.
+
+    Random splits use every seed with fold 0; blocked schemes use every
+    fold, with the seed only changing the forest. n_groups maps a blocked
+    scheme to its number of distinct blocks (caps the fold count).
+    """
+    n_groups = n_groups or {}
+    tasks = []
+    for target in targets:
+        for scheme in schemes:
+            folds = [0] if SCHEMES[scheme] is None else range(min(n_folds, n_groups.get(scheme, n_folds)))
+            tasks += [(target, scheme, seed, fold) for seed in seeds for fold in folds]
+    return tasks
+
+
+def _task_key(target, scheme, seed, fold):
+    return f"{target}|{scheme}|{seed}|{fold}"
+
+
+def sweep_id(arrays_dir, n_folds, with_shap):
+    """sha1 of the shared arrays and the settings that change a task's result."""
+    meta = json.loads((Path(arrays_dir) / "arrays.json").read_text())
+    settings = {"arrays": meta["digest"], "n_folds": n_folds, "with_shap": with_shap,
+                "test_size": TEST_SIZE, "rf_params": RF_PARAMS}
+    return hashlib.sha1(json.dumps(settings, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def read_results(path, repair=False):
+    """
+    Finished rows from a JSON-lines results file.
+
+    A final line cut short by an interrupted write is skipped; with
+    repair=True it is also truncated from the file, so rows appended next
+    start on a line of their own. An undecodable line elsewhere raises.
+    """
+    path = Path(path)
+    if not path.exists():
+        return []
+    with open(path, "rb") as f:
+        lines = f.readlines()
+
+    rows = []
+    for i, line in enumerate(lines):
+        if not line.strip():
+            continue
+        try:
+            rows.append(json.loads(line))
+        except ValueError:
+            if i < len(lines) - 1:
+                raise
+            print(f"Skipped a partial last line in {path}.")
+            if repair:
+                os.truncate(path, path.stat().st_size - len(line))
+            return rows
+
+    if repair and lines and not lines[-1].endswith(b"\n"):
+        # Complete row, but the write stopped before its newline.
+        with open(path, "ab") as f:
+            f.write(b"\n")
+    return rows
+
+
+def run_sweep(arrays_dir=SHARED_DIR, seeds=range(20), schemes=("random", "borough"),
+              targets=TARGETS, n_folds=5, with_shap=True, results_path=None,
+              max_workers=MAX_WORKERS):
+    """
+    Fit every (target, scheme, seed, fold) task on a process pool.
+
+    Rows are appended to results_path (default arrays_dir/results.jsonl)
+    as tasks finish, tagged with sweep_id(); tasks already in the file for
+    the same sweep id are skipped, and rows from other arrays or settings
+    are ignored. Returns this sweep's metrics as a DataFrame (SHAP kept as
+    a dict column).
+    """
+    arrays_dir = Path(arrays_dir)
+    results_path = Path(results_path or arrays_dir / "results.jsonl")
+    sweep = sweep_id(arrays_dir, n_folds, with_shap)
+
+    n_groups = {s: int(np.load(arrays_dir / f"groups_{s}.npy", mmap_mode="r").max()) + 1
+                for s in schemes if SCHEMES[s] is not None}
+    tasks = sweep_tasks(seeds, schemes, targets, n_folds, n_groups)
+    done = {_task_key(r["target"], r["scheme"], r["seed"], r["fold"])
+            for r in read_results(results_path, repair=True) if r.get("sweep") == sweep}
+    todo = [t for t in tasks if _task_key(*t) not in done]
+    print(f"{len(tasks)} tasks, {len(tasks) - len(todo)} already done.")
+
+    with open(results_path, "a") as out, \
+            ProcessPoolExecutor(max_workers, initializer=_init_worker,
+                                initargs=(str(arrays_dir),)) as pool:
+        futures = [pool.submit(_fit_task, *t, n_folds, with_shap) for t in todo]
+        for i, future in enumerate(as_completed(futures), 1):
+            out.write(json.dumps({"sweep": sweep, **future.result()}) + "\n")
+            out.flush()
+            if i % 25 == 0 or i == len(futures):
+                print(f"Finished {i}/{len(futures)} tasks.")
+
+    return pd.DataFrame([r for r in read_results(results_path) if r.get("sweep") == sweep])
+
+
+def summarize(results, metrics=("r2", "rmse", "mae")):
+    """Distribution of each metric per target and split scheme."""
+    grouped = results.groupby(["target", "scheme"])[list(metrics)]
+    table = grouped.describe(percentiles=[0.05, 0.5, 0.95])
+    return table.loc[:, (slice(None), ["count", "mean", "std", "5%", "50%", "95%"])].round(4)
+
+
+def feature_ranks(results, top=3):
+    """
+    Mean-|SHAP| ranking of each feature across runs, per target.
+
+    Columns: mean_abs_shap, mean_rank, rank_std, share of runs in the top N.
+    """
+    results = results.dropna(subset=["mean_abs_shap"])
+    rows = []
+    for target, group in results.groupby("target"):
+        shap_df = pd.DataFrame(list(group["mean_abs_shap"]))
+        ranks = shap_df.rank(axis=1, ascending=False)
+        rows.append(pd.DataFrame({
+            "target": target,
+            "feature": shap_df.columns,
+            "mean_abs_shap": shap_df.mean().to_numpy(),
+            "mean_rank": ranks.mean().to_numpy(),
+            "rank_std": ranks.std().to_numpy(),
+            f"top{top}_share": (ranks <= top).mean().to_numpy(),
+        }))
+    table = pd.concat(rows, ignore_index=True)
+    return table.sort_values(["target", "mean_rank"], ignore_index=True).round(4)
@@ -0,0 +1,511 @@
+"""
+Content-addressed stage cache and DAG runner for the notebook pipeline.
+
+Each stage declares its inputs, parameters and outputs. A stage's key is
+the sha1 of its name, code (notebook or function source), parameters and
+the contents of its inputs, the same way notebooks/cache/ names osmnx
+responses by sha1. Outputs are stored under cache/stages/<key>/ after a
+run, so:
+
+- a stage whose key has not changed and whose outputs are intact is
+  skipped;
+- a stage whose key matches an earlier run gets its outputs restored from
+  the store instead of being re-run;
+- independent branches (ACS, NLCD rasters, the 311 panel, ...) run in
+  parallel once their upstream stages are done.
+
+Dependencies come from matching one stage's inputs to another's outputs,
+plus an explicit `after` list for ordering that no file expresses.
+
+A notebook stage's code is the source of its code cells (the parameters
+cell included); outputs, execution counts and metadata are left out, and
+the notebook is executed into a scratch copy under cache/stages/_executed/
+rather than in place, so running a stage neither changes its key nor
+dirties the tracked notebook.
+
+A notebook stage's params reach the notebook as JSON in PIPELINE_PARAMS;
+its parameters cell (tagged "parameters", as papermill expects) reads them
+with notebook_params(), so the values in the cache key are the values the
+notebook runs with:
+
+    from pipeline.runner import notebook_params
+
+    params = notebook_params(threshold_f = 91.0)
+
+Run from notebooks/:
+
+    python -m pipeline.runner                 # whole pipeline
+    python -m pipeline.runner 06_merge        # one stage and its upstream
+    python -m pipeline.runner --dry-run       # show what would run
+    python -m pipeline.runner --profile cache/profile
+                                              # per-stage trace and summary
+    python -m pipeline.runner --self-test     # second run skips every stage
+"""
+
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+
+from . import profiling
+
+# Configuration.
+PARAMS_VAR = "PIPELINE_PARAMS"
+STORE_DIR = Path("cache/stages")
+STAT_CACHE = STORE_DIR / "_file_hashes.json"
+EXECUTED_DIR = STORE_DIR / "_executed"
+MAX_WORKERS = 3
+
+
+class Stage:
+    """One pipeline step: a notebook or a Python callable."""
+
+    def __init__(self, name, run, inputs=(), outputs=(), params=None, after=()):
+        self.name = name
+        self.run = run
+        self.inputs = [Path(p) for p in inputs]
+        self.outputs = [Path(p) for p in outputs]
+        self.params = params or {}
+        self.after = list(after)
+
+    def code_fingerprint(self):
+        """Bytes that identify the stage's code."""
+        if isinstance(self.run, (str, Path)):
+            return notebook_code(self.run)
+        try:
+            return inspect.getsource(self.run).encode()
+        except (OSError, TypeError):
+            return repr(self.run).encode()
+
+    def execute(self, executed_dir=EXECUTED_DIR):
+        """
+        Run the notebook into executed_dir/<name>.ipynb, or call the
+        function with params. The notebook still runs from its own folder.
+        """
+        if isinstance(self.run, (str, Path)):
+            env = dict(os.environ, **{PARAMS_VAR: json.dumps(self.params, sort_keys=True)})
+            Path(executed_dir).mkdir(parents=True, exist_ok=True)
+            subprocess.run(
+                [sys.executable, "-m", "jupyter", "nbconvert", "--to", "notebook",
+                 "--execute", str(self.run), "--output-dir", str(executed_dir),
+                 "--output", f"{self.name}.ipynb"],
+                check=True, env=env,
+            )
+        else:
+            self.run(**self.params)
+
+
+def notebook_code(path):
+    """Code-cell sources of a notebook, without outputs or metadata."""
+    nb = json.loads(Path(path).read_text(encoding="utf-8"))
+    sources = []
+    for cell in nb.get("cells", []):
+        if cell.get("cell_type") == "code":
+            source = cell.get("source", "")
+            sources.append(source if isinstance(source, str) else "".join(source))
+    return json.dumps(sources).encode()
+
+
+def notebook_params(**defaults):
+    """
+    A notebook's parameters: defaults, overridden by the runner's
+    PIPELINE_PARAMS. A name without a default is an error, so a stage
+    declaration cannot drift from the notebook it runs.
+    """
+    given = json.loads(os.environ.get(PARAMS_VAR) or "{}")
+    unknown = set(given) - set(defaults)
+    if unknown:
+        raise KeyError(f"Unknown notebook parameters: {sorted(unknown)}")
+    return {**defaults, **given}
+
+
+# Hashing.
+class FileHasher:
+    """sha1 of file contents, memoized by (size, mtime) across runs."""
+
+    def __init__(self, path=STAT_CACHE):
+        self.path = Path(path)
+        self.memo = json.loads(self.path.read_text()) if self.path.exists() else {}
+
+    def _file(self, path):
+        st = path.stat()
+        stamp = [st.st_size, st.st_mtime_ns]
+        entry = self.memo.get(str(path))
+        if entry and entry[0] == stamp:
+            return entry[1]
+
+        h = hashlib.sha1()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        digest = h.hexdigest()
+        self.memo[str(path)] = [stamp, digest]
+        return digest
+
+    def members(self, path):
+        """Files that make up an input: a directory's files, a shapefile's sidecars."""
+        if path.is_dir():
+            return sorted(p for p in path.rglob("*") if p.is_file())
+        if path.suffix.lower() == ".shp":
+            return sorted(p for p in path.parent.glob(f"{path.stem}.*") if p.is_file())
+        return [path]
+
+    def digest(self, path):
+        """Content hash of an input, or 'missing'."""
+        path = Path(path)
+        if not path.exists():
+            return "missing"
+        h = hashlib.sha1()
+        for member in self.members(path):
+            h.update(str(member.relative_to(path.parent)).encode())
+            h.update(self._file(member).encode())
+        return h.hexdigest()
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(json.dumps(self.memo))
+
+
+def stage_key(stage, hasher):
+    """sha1 over name, code, params and input contents."""
+    h = hashlib.sha1()
+    h.update(stage.name.encode())
+    h.update(stage.code_fingerprint())
+    h.update(json.dumps(stage.params, sort_keys=True, default=str).encode())
+    for path in stage.inputs:
+        h.update(str(path).encode())
+        h.update(hasher.digest(path).encode())
+    return h.hexdigest()
+
+
+# Output store.
+def _copy(src, dst):
+    # Copies rather than hard links: notebooks rewrite outputs in place,
+    # which would change a linked copy in the store too.
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    shutil.copy2(src, dst)
+
+
+def _store_files(path):
+    if path.is_dir():
+        return [p for p in path.rglob("*") if p.is_file()]
+    if path.suffix.lower() == ".shp":
+        return [p for p in path.parent.glob(f"{path.stem}.*") if p.is_file()]
+    return [path] if path.exists() else []
+
+
+class StageStore:
+    """Records each stage's last key and keeps outputs per key."""
+
+    def __init__(self, root=STORE_DIR):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _record_path(self, stage):
+        return self.root / f"{stage.name}.json"
+
+    def record(self, stage):
+        path = self._record_path(stage)
+        return json.loads(path.read_text()) if path.exists() else None
+
+    def is_current(self, stage, key, hasher):
+        """Key unchanged and every output still matches its stored hash."""
+        rec = self.record(stage)
+        if rec is None or rec["key"] != key:
+            return False
+        return all(hasher.digest(p) == rec["outputs"].get(str(p)) for p in stage.outputs)
+
+    def has(self, key):
+        return (self.root / key / "_complete").exists()
+
+    def save(self, stage, key, hasher):
+        """Copy outputs into the store under key and record the run."""
+        obj_dir = self.root / key
+        for out in stage.outputs:
+            for f in _store_files(out):
+                _copy(f, obj_dir / f)
+        (obj_dir / "_complete").touch()
+        self._write_record(stage, key, hasher)
+
+    def restore(self, stage, key, hasher):
+        """Put a stored run's outputs back in place."""
+        obj_dir = self.root / key
+        for f in obj_dir.rglob("*"):
+            if f.is_file() and f.name != "_complete":
+                _copy(f, f.relative_to(obj_dir))
+        self._write_record(stage, key, hasher)
+
+    def _write_record(self, stage, key, hasher):
+        rec = {
+            "key": key,
+            "outputs": {str(p): hasher.digest(p) for p in stage.outputs},
+            "finished": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        self._record_path(stage).write_text(json.dumps(rec, indent=2))
+
+
+# DAG.
+def dependencies(stages):
+    """Map stage name to the names of the stages it depends on."""
+    producer = {str(out): s.name for s in stages for out in s.outputs}
+    deps = {}
+    for s in stages:
+        ups = {producer[str(p)] for p in s.inputs if str(p) in producer}
+        ups.update(s.after)
+        ups.discard(s.name)
+        deps[s.name] = ups
+    return deps
+
+
+def upstream_closure(targets, deps):
+    """Targets plus everything they depend on."""
+    keep, todo = set(), list(targets)
+    while todo:
+        name = todo.pop()
+        if name not in keep:
+            keep.add(name)
+            todo.extend(deps[name])
+    return keep
+
+
+def run_pipeline(stages, targets=None, force=False, dry_run=False,
+                 max_workers=MAX_WORKERS, store_dir=STORE_DIR):
+    """
+    Run stages in dependency order, skipping unchanged ones.
+
+    A stage's key is computed only once its upstream stages are done, so it
+    sees their fresh outputs. Returns {stage name: status}.
+    """
+    by_name = {s.name: s for s in stages}
+    deps = dependencies(stages)
+    wanted = upstream_closure(targets, deps) if targets else set(by_name)
+
+    store = StageStore(store_dir)
+    hasher = FileHasher(Path(store_dir) / STAT_CACHE.name)
+    status = {}
+    remaining = {n: set(deps[n]) & wanted for n in wanted}
+
+    def process(name):
+        stage = by_name[name]
+        key = stage_key(stage, hasher)
+        if not force and store.is_current(stage, key, hasher):
+            return "skipped"
+        if not force and store.has(key):
+            if not dry_run:
+                store.restore(stage, key, hasher)
+            return "restored"
+        if dry_run:
+            return "would run"
+
+        t0 = time.perf_counter()
+        kind = "notebook" if isinstance(stage.run, (str, Path)) else "function"
+        with profiling.stage(name, cat=kind):
+            stage.execute(Path(store_dir) / EXECUTED_DIR.name)
+        store.save(stage, key, hasher)
+        return f"ran ({time.perf_counter() - t0:.1f} s)"
+
+    with ThreadPoolExecutor(max_workers) as pool:
+        running = {}
+        while remaining or running:
+            ready = [n for n, ups in remaining.items() if not ups]
+            for name in sorted(ready):
+                del remaining[name]
+                running[pool.submit(process, name)] = name
+
+            if not running:
+                raise RuntimeError(f"Dependency cycle among: {sorted(remaining)}")
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                status[name] = future.result()
+                print(f"{name}: {status[name]}.")
+                for ups in remaining.values():
+                    ups.discard(name)
+
+    hasher.save()
+    return status
+
+
+# Pipeline definition.
+TRACTS = "data/nyc_tracts_2020/nyc_tracts_2020.shp"
+
+PIPELINE = [
+    Stage(
+        "01a_weather_stations", "01a_weather_station_data_filtering.ipynb",
+        inputs=["data/2025.tar.gz"],
+        outputs=["data/nyc_two_stations/NYC_Central_Park.csv",
+                 "data/nyc_two_stations/NYC_JFK_Airport.csv"],
+    ),
+    Stage(
+        "01b_heat_days", "01b_extreme_heat_days_filter.ipynb",
+        inputs=["data/History weather station data",
+                "data/nyc_two_stations/NYC_JFK_Airport.csv"],
+        outputs=["data/heat/JFK_2025_JJA_extreme_heat_90.csv"],
+        params={"threshold_f": 91.0},
+    ),
+    Stage(
+        "02_311_panel", "02_311_tract_daily.ipynb",
+        inputs=[TRACTS],
+        outputs=["data/nyc_311/nyc_311_tract_day_2025.csv"],
+        params={"start": "2025-06-01", "end": "2025-08-22"},
+    ),
+    Stage(
+        "03_acs", "03_acs_tract.ipynb",
+        outputs=["data/acs/acs_socioeconomic_tract_2022.csv"],
+        params={"table": "ACSDT5Y2022"},
+    ),
+    Stage(
+        "04_additional_features", "04_additional_feature.ipynb",
+        inputs=[TRACTS, "data/raster/NDVI.tif", "data/Water shp/NYC_water.shp",
+                "data/Buildings/geo_export_10da9e2c-833d-4ba4-9fe2-1f999ac16759.shp"],
+        outputs=["data/additional_features/nyc_tracts_new_variables.csv"],
+    ),
+    Stage(
+        "05_nlcd", "05_nlcd_calculations.ipynb",
+        inputs=[TRACTS, "data/raster/nlcd_raster/nlcd_tree_canopy_2023.tiff",
+                "data/raster/nyc_impervious_2024.tif"],
+        outputs=["data/raster/nlcd_calc_tracts.csv",
+                 "data/raster/nlcd_calc_tracts.geojson"],
+    ),
+    Stage(
+        "06_merge", "06_data_merge_cleaning.ipynb",
+        inputs=[TRACTS,
+                "data/heat/JFK_2025_JJA_extreme_heat_90.csv",
+                "data/nyc_311/nyc_311_tract_day_2025.csv",
+                "data/acs/acs_socioeconomic_tract_2022.csv",
+                "data/raster/nlcd_calc_tracts.csv",
+                "data/additional_features/nyc_tracts_new_variables.csv"],
+        outputs=["data/heat_311/heat_week_311_calls.csv",
+                 "data/model/target_variables.csv",
+                 "data/model/Final_Data_Model.csv"],
+    ),
+    Stage(
+        "07_ols_ml", "07_ols_ml.ipynb",
+        inputs=["data/model/Final_Data_Model.csv"],
+        outputs=["images/SHAP2"],
+    ),
+]
+
+
+# Self-test.
+SELF_TEST_SOURCES = {
+    "produce": "from pipeline.runner import notebook_params\n"
+               "params = notebook_params(n = 3)\n"
+               "open('numbers.txt', 'w').write('\\n'.join(map(str, range(params['n']))))",
+    "consume": "total = sum(int(x) for x in open('numbers.txt'))\n"
+               "open('total.txt', 'w').write(str(total))\n"
+               "print(total)",
+}
+
+
+def _write_notebook(path, source):
+    nb = {
+        "cells": [{"cell_type": "code", "execution_count": None, "id": "c0",
+                   "metadata": {}, "outputs": [], "source": source}],
+        "metadata": {"kernelspec": {"name": "python3", "display_name": "Python 3",
+                                    "language": "python"}},
+        "nbformat": 4, "nbformat_minor": 5,
+    }
+    Path(path).write_text(json.dumps(nb, indent=1) + "\n", encoding="utf-8")
+
+
+def self_test():
+    """
+    Run a two-notebook pipeline twice in a scratch folder and check that
+    the second run skips every stage and leaves the notebooks untouched.
+    Needs jupyter nbconvert and a python3 kernel.
+    """
+    cwd = os.getcwd()
+    package_root = str(Path(__file__).resolve().parent.parent)
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        # The notebooks import pipeline.runner from this checkout.
+        old_path = os.environ.get("PYTHONPATH")
+        os.environ["PYTHONPATH"] = os.pathsep.join(filter(None, [package_root, old_path]))
+        try:
+            for name, source in SELF_TEST_SOURCES.items():
+                _write_notebook(f"{name}.ipynb", source)
+            stages = [
+                Stage("produce", "produce.ipynb", outputs=["numbers.txt"], params={"n": 5}),
+                Stage("consume", "consume.ipynb", inputs=["numbers.txt"],
+                      outputs=["total.txt"]),
+            ]
+            before = {p: p.read_bytes() for p in Path(".").glob("*.ipynb")}
+
+            first = run_pipeline(stages, store_dir="store")
+            second = run_pipeline(stages, store_dir="store")
+            after = {p: p.read_bytes() for p in Path(".").glob("*.ipynb")}
+            total = Path("total.txt").read_text()
+        finally:
+            os.chdir(cwd)
+            if old_path is None:
+                os.environ.pop("PYTHONPATH", None)
+            else:
+                os.environ["PYTHONPATH"] = old_path
+
+    failures = []
+    if not all(v.startswith("ran") for v in first.values()):
+        failures.append(f"first run did not run every stage: {first}")
+    if set(second.values()) != {"skipped"}:
+        failures.append(f"second run did not skip every stage: {second}")
+    if after != before:
+        failures.append("running the pipeline changed the notebooks")
+    if total != "10":
+        failures.append(f"params did not reach the notebook: total {total!r}, expected '10'")
+    for failure in failures:
+        print(f"FAIL: {failure}.")
+    if not failures:
+        print("Self-test passed: the second run skipped every stage.")
+    return not failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the notebook pipeline.")
+    parser.add_argument("targets", nargs="*", help="Stages to bring up to date (default: all).")
+    parser.add_argument("--force", action="store_true", help="Re-run even if unchanged.")
+    parser.add_argument("--dry-run", action="store_true", help="Report without running.")
+    parser.add_argument("--jobs", type=int, default=MAX_WORKERS, help="Parallel stages.")
+    parser.add_argument("--profile", metavar="DIR",
+                        help="Write a Chrome trace and per-stage summary to DIR.")
+    parser.add_argument("--self-test", action="store_true",
+                        help="Check that a repeated run skips every notebook stage.")
+    args = parser.parse_args(argv)
+
+    if args.self_test:
+        sys.exit(0 if self_test() else 1)
+
+    names = {s.name for s in PIPELINE}
+    unknown = set(args.targets) - names
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+
+    if args.profile:
+        # Notebook kernels inherit the variable and write their own traces.
+        profile_dir = Path(args.profile)
+        for old in profile_dir.glob("trace-*.json"):
+            old.unlink()
+        os.environ[profiling.ENV_VAR] = str(profile_dir)
+        profiling.enable(profile_dir / f"trace-{os.getpid()}.json")
+
+    run_pipeline(PIPELINE, args.targets or None, force=args.force,
+                 dry_run=args.dry_run, max_workers=args.jobs)
+
+    if args.profile:
+        profiling.PROFILER.write_trace()
+        events = profiling.merge_traces(profile_dir, profile_dir / "trace.json")
+        print()
+        print(profiling.summary(events))
+        print(f"Trace: {profile_dir / 'trace.json'} ({len(events)} events).")
+
+
+if __name__ == "__main__":
+    main()
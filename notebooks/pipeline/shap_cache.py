@@ -0,0 +1,149 @@
+"""
+Chunked, parallel SHAP computation with a persistent on-disk cache.
+
+07_ols_ml.ipynb calls shap.TreeExplainer(rf_model).shap_values(X_full) on
+the whole dataset in one call, every time the notebook runs, for forests of
+up to 600 deep trees. This service:
+
+- splits rows into chunks and explains them on a process pool (each worker
+  builds its TreeExplainer once);
+- writes the SHAP matrix into a memory-mapped .npy under cache/shap/,
+  keyed by a fingerprint of the model and a hash of the data;
+- serves the summaries the plots need (mean |SHAP|, percentages,
+  per-feature dependence arrays) from that file, so replotting never
+  recomputes explanations.
+
+Usage:
+
+    service = ShapService(rf_model, X, feature_names=all_predictors)
+    shap_values = service.values              # (n_samples, n_features) memmap
+    shap_df = service.importance()            # feature, importance, percentage
+    x, s = service.dependence("PCT_IMPERVIOUS")
+"""
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from . import profiling
+
+# Configuration.
+CACHE_DIR = Path("cache/shap")
+CHUNK_ROWS = 256
+MAX_WORKERS = os.cpu_count() or 1
+
+
+def model_fingerprint(model):
+    """Stable hash of a fitted model's parameters and trees."""
+    return joblib.hash(model)
+
+
+def data_fingerprint(X):
+    """Hash of the explained rows."""
+    return joblib.hash(np.ascontiguousarray(X, dtype=np.float64))
+
+
+# Worker state.
+_explainer = None
+
+
+def _init_worker(model):
+    global _explainer
+    import shap
+    _explainer = shap.TreeExplainer(model)
+
+
+def _explain_chunk(start, rows):
+    return start, np.asarray(_explainer.shap_values(rows), dtype=np.float32)
+
+
+@profiling.profiled("SHAP", input_arg="X", output=False)
+def compute_shap(model, X, out_path, chunk_rows=CHUNK_ROWS, max_workers=MAX_WORKERS):
+    """
+    Explain X in row chunks on a process pool, writing into an .npy memmap.
+
+    Returns the expected value of the explainer.
+    """
+    import shap
+
+    X = np.ascontiguousarray(X, dtype=np.float64)
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = out_path.with_suffix(".tmp.npy")
+
+    values = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32, shape=X.shape)
+    starts = range(0, len(X), chunk_rows)
+
+    if max_workers > 1 and len(starts) > 1:
+        with ProcessPoolExecutor(max_workers, initializer=_init_worker,
+                                 initargs=(model,)) as pool:
+            futures = [pool.submit(_explain_chunk, s, X[s:s + chunk_rows]) for s in starts]
+            for future in futures:
+                start, chunk = future.result()
+                values[start:start + len(chunk)] = chunk
+    else:
+        _init_worker(model)
+        for s in starts:
+            _, chunk = _explain_chunk(s, X[s:s + chunk_rows])
+            values[s:s + len(chunk)] = chunk
+
+    values.flush()
+    del values
+    os.replace(tmp_path, out_path)
+    profiling.current().output(out_path)
+
+    expected = shap.TreeExplainer(model).expected_value
+    return float(np.ravel(expected)[0])
+
+
+class ShapService:
+    """SHAP values for one (model, data) pair, computed once and cached."""
+
+    def __init__(self, model, X, feature_names=None, cache_dir=CACHE_DIR, **compute_kwargs):
+        if feature_names is None:
+            feature_names = list(getattr(X, "columns", range(np.shape(X)[1])))
+        self.feature_names = [str(f) for f in feature_names]
+        self.X = np.asarray(X, dtype=np.float64)
+
+        self.key = f"{model_fingerprint(model)}_{data_fingerprint(self.X)}"
+        self.values_path = Path(cache_dir) / f"{self.key}.npy"
+        self.meta_path = Path(cache_dir) / f"{self.key}.json"
+
+        if not (self.values_path.exists() and self.meta_path.exists()):
+            expected = compute_shap(model, self.X, self.values_path, **compute_kwargs)
+            meta = {"feature_names": self.feature_names, "expected_value": expected,
+                    "shape": list(self.X.shape)}
+            self.meta_path.write_text(json.dumps(meta, indent=2))
+
+        self.meta = json.loads(self.meta_path.read_text())
+        self.expected_value = self.meta["expected_value"]
+        self._values = None
+
+    @property
+    def values(self):
+        """(n_samples, n_features) SHAP matrix, memory-mapped read-only."""
+        if self._values is None:
+            self._values = np.load(self.values_path, mmap_mode="r")
+        return self._values
+
+    def mean_abs(self):
+        """Mean |SHAP| per feature."""
+        return pd.Series(np.abs(self.values).mean(axis=0), index=self.feature_names)
+
+    def importance(self):
+        """Features sorted by mean |SHAP| with percentage share, as in 07."""
+        imp = self.mean_abs()
+        df = pd.DataFrame({"feature": imp.index, "importance": imp.to_numpy()})
+        df = df.sort_values("importance", ascending=False, ignore_index=True)
+        df["percentage"] = df["importance"] / df["importance"].sum() * 100
+        return df
+
+    def dependence(self, feature):
+        """(feature values, SHAP values) for one feature's scatter plot."""
+        idx = self.feature_names.index(feature)
+        return self.X[:, idx], np.asarray(self.values[:, idx])
@@ -0,0 +1,170 @@
+"""
+Typed columnar storage for pipeline intermediates.
+
+Writes intermediates as Parquet with compact dtypes instead of CSV:
+
+- GEOID dictionary-encoded (pandas category) or int64, so it no longer
+  travels as a string re-parsed with dtype={"GEOID": str};
+- integer columns, and the float columns declared in COUNT_COLS (counts
+  and populations that a merge turned into floats), as int32;
+- other float columns (rates, shares, features) as float32;
+- the text columns declared in CATEGORY_COLS as pandas category; other
+  text columns are left as they are.
+
+Dtypes come from the source dtype, COUNT_COLS and CATEGORY_COLS, never
+from the values, so every batch of a table is written with the same
+schema.
+
+Readers load only the columns they ask for, memory-mapping the file, so
+07_ols_ml.ipynb can read its 14 predictors and 2 targets without loading
+the rest of Final_Data_Model.csv. report_savings() compares size, memory
+and load time against the current CSVs.
+
+Usage:
+
+    convert_csv("data/model/Final_Data_Model.csv")
+    df = read_table("data/model/Final_Data_Model.parquet",
+                    columns=all_predictors + targets)
+
+float32 keeps about 7 significant digits; results computed from these
+tables can differ from the CSV versions in the last decimal places.
+"""
+
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# Configuration.
+INTERMEDIATES = [
+    Path("data/nyc_311/nyc_311_tract_day_2025.csv"),
+    Path("data/acs/acs_socioeconomic_tract_2022.csv"),
+    Path("data/raster/nlcd_calc_tracts.csv"),
+    Path("data/additional_features/nyc_tracts_new_variables.csv"),
+    Path("data/heat_311/heat_week_311_calls.csv"),
+    Path("data/model/target_variables.csv"),
+    Path("data/model/Final_Data_Model.csv"),
+]
+
+GEOID_COLS = ("GEOID", "geoid")
+# Whole-number columns that can arrive as floats (NaN from a merge, or a
+# CSV written from a float frame); stored as nullable int32.
+COUNT_COLS = ("TOTAL_CALLS", "QOL_CALLS", "TOTAL_POP", "TOTAL_POP_x", "TOTAL_POP_y",
+              "NO_VEHICLE_HH", "HH_TOTAL", "POI_500M_DENSITY")
+# Low-cardinality text columns, dictionary-encoded.
+CATEGORY_COLS = ("complaint_type", "descriptor", "borough")
+COMPRESSION = "zstd"
+INT32_MIN, INT32_MAX = np.iinfo(np.int32).min, np.iinfo(np.int32).max
+
+
+def compact_dtypes(df, geoid="category", counts=COUNT_COLS, categories=CATEGORY_COLS):
+    """
+    Copy of df with compact dtypes.
+
+    geoid is "category" (dictionary-encoded) or "int64". Float columns named
+    in counts become nullable int32 and must hold whole numbers; text
+    columns named in categories become category.
+    """
+    out = df.copy()
+    for col in out.columns:
+        s = out[col]
+        if col in GEOID_COLS:
+            out[col] = s.astype("int64") if geoid == "int64" else s.astype(str).astype("category")
+        elif pd.api.types.is_bool_dtype(s):
+            continue
+        elif pd.api.types.is_integer_dtype(s):
+            if s.min() < INT32_MIN or s.max() > INT32_MAX:
+                raise ValueError(f"Integer column {col} does not fit in int32.")
+            out[col] = s.astype("Int32" if pd.api.types.is_extension_array_dtype(s) else "int32")
+        elif pd.api.types.is_float_dtype(s):
+            if col not in counts:
+                out[col] = s.astype("float32")
+                continue
+            values = s.dropna().to_numpy()
+            if not np.all(values == np.round(values)):
+                raise ValueError(f"Count column {col} holds fractional values.")
+            out[col] = s.astype("Int32")
+        elif pd.api.types.is_datetime64_any_dtype(s):
+            continue
+        elif col in categories and s.dtype == object:
+            out[col] = s.astype("category")
+    return out
+
+
+def write_table(df, path, geoid="category"):
+    """Write df as compressed Parquet with compact dtypes."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    compact_dtypes(df, geoid).to_parquet(path, index=False, compression=COMPRESSION)
+    return path
+
+
+def read_table(path, columns=None, memory_map=True):
+    """Read only the requested columns, memory-mapping the file."""
+    table = pq.read_table(path, columns=columns, memory_map=memory_map)
+    return table.to_pandas()
+
+
+def open_table(path):
+    """Lazy pyarrow dataset; filter and project before materializing."""
+    return ds.dataset(path, format="parquet")
+
+
+def convert_csv(csv_path, out_path=None, geoid="category"):
+    """Convert one CSV intermediate to Parquet next to it."""
+    csv_path = Path(csv_path)
+    out_path = Path(out_path) if out_path else csv_path.with_suffix(".parquet")
+    df = pd.read_csv(csv_path, dtype={c: str for c in GEOID_COLS})
+    return write_table(df, out_path, geoid)
+
+
+def report_savings(csv_paths=INTERMEDIATES, columns=None):
+    """
+    File size, memory and load time: CSV vs typed Parquet.
+
+    columns optionally maps a CSV path to the column list a reader needs,
+    e.g. the predictors and targets for Final_Data_Model.csv; the Parquet
+    load then reads only those.
+    """
+    columns = columns or {}
+    rows = []
+    for csv_path in map(Path, csv_paths):
+        if not csv_path.exists():
+            continue
+        pq_path = csv_path.with_suffix(".parquet")
+        if not pq_path.exists() or pq_path.stat().st_mtime < csv_path.stat().st_mtime:
+            convert_csv(csv_path, pq_path)
+
+        t0 = time.perf_counter()
+        df_csv = pd.read_csv(csv_path, dtype={c: str for c in GEOID_COLS})
+        t_csv = time.perf_counter() - t0
+
+        cols = columns.get(str(csv_path))
+        t0 = time.perf_counter()
+        df_pq = read_table(pq_path, columns=cols)
+        t_pq = time.perf_counter() - t0
+
+        rows.append({
+            "file": csv_path.name,
+            "csv_mb": csv_path.stat().st_size / 1e6,
+            "parquet_mb": pq_path.stat().st_size / 1e6,
+            "csv_mem_mb": df_csv.memory_usage(deep=True).sum() / 1e6,
+            "parquet_mem_mb": df_pq.memory_usage(deep=True).sum() / 1e6,
+            "csv_load_ms": t_csv * 1000,
+            "parquet_load_ms": t_pq * 1000,
+            "columns_read": len(df_pq.columns),
+        })
+
+    report = pd.DataFrame(rows)
+    if not report.empty:
+        report["mem_saving"] = 1 - report["parquet_mem_mb"] / report["csv_mem_mb"]
+        report["load_speedup"] = report["csv_load_ms"] / report["parquet_load_ms"]
+    return report.round(3)
+
+
+if __name__ == "__main__":
+    with pd.option_context("display.width", 200, "display.max_columns", None):
+        print(report_savings())
@@ -0,0 +1,160 @@
+"""
+Vectorized point-in-tract assignment for 311 calls.
+
+Builds one STRtree over the tract polygons and assigns raw lat/lon arrays to
+tracts in chunks, without creating a GeoDataFrame or a shapely Point per
+call. Results come back as compact integer codes into a sorted GEOID table,
+which converts directly to a pandas Categorical.
+
+Usage:
+
+    index = TractIndex.from_file("data/nyc_tracts_2020/nyc_tracts_2020.shp")
+    calls_311["GEOID"] = index.assign_categorical(
+        calls_311["longitude"].to_numpy(), calls_311["latitude"].to_numpy()
+    )
+"""
+
+import time
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+from pyproj import Transformer
+
+from . import profiling
+
+# Configuration.
+NYC_PREFIXES = ("36005", "36047", "36061", "36081", "36085")
+CHUNK_SIZE = 1_000_000
+
+
+class TractIndex:
+    """Spatial index over tract polygons, built once and reused."""
+
+    def __init__(self, tracts, geoid_col="geoid", points_crs="EPSG:4326"):
+        tracts = tracts[[geoid_col, "geometry"]].sort_values(geoid_col)
+        tracts = tracts.reset_index(drop=True)
+
+        self.geoids = tracts[geoid_col].astype(str).to_numpy()
+        self.crs = tracts.crs
+        self.geoms = tracts.geometry.to_numpy()
+        shapely.prepare(self.geoms)
+        self.tree = shapely.STRtree(self.geoms)
+
+        self.code_dtype = np.int16 if len(self.geoids) < np.iinfo(np.int16).max else np.int32
+        self.transformer = None
+        if self.crs is not None and points_crs is not None:
+            self.transformer = Transformer.from_crs(points_crs, self.crs, always_xy=True)
+
+    @classmethod
+    def from_file(cls, path, geoid_col="geoid", prefixes=NYC_PREFIXES, **kwargs):
+        """Read a tract shapefile, keeping only NYC county GEOIDs."""
+        tracts = gpd.read_file(path)
+        if prefixes:
+            tracts = tracts[tracts[geoid_col].str.startswith(prefixes)].copy()
+        return cls(tracts, geoid_col=geoid_col, **kwargs)
+
+    def _assign_chunk(self, x, y):
+        """Tract codes for one chunk of projected coordinates, -1 if none."""
+        codes = np.full(len(x), -1, dtype=self.code_dtype)
+        valid = np.isfinite(x) & np.isfinite(y)
+        if not valid.any():
+            return codes
+
+        valid_idx = np.flatnonzero(valid)
+        points = shapely.points(x[valid_idx], y[valid_idx])
+        point_idx, tract_idx = self.tree.query(points, predicate="within")
+
+        # Tracts do not overlap, but keep the first match if they ever do,
+        # so each call is counted once.
+        point_idx, first = np.unique(point_idx, return_index=True)
+        codes[valid_idx[point_idx]] = tract_idx[first]
+        return codes
+
+    @profiling.profiled("311 tract assign", input_arg="lon")
+    def assign(self, lon, lat, chunk_size=CHUNK_SIZE):
+        """Integer tract codes (index into self.geoids) for lon/lat arrays."""
+        lon = np.asarray(lon, dtype="float64")
+        lat = np.asarray(lat, dtype="float64")
+        codes = np.empty(len(lon), dtype=self.code_dtype)
+
+        for start in range(0, len(lon), chunk_size):
+            stop = start + chunk_size
+            x, y = lon[start:stop], lat[start:stop]
+            if self.transformer is not None:
+                x, y = self.transformer.transform(x, y)
+            codes[start:stop] = self._assign_chunk(np.asarray(x), np.asarray(y))
+        return codes
+
+    def assign_categorical(self, lon, lat, chunk_size=CHUNK_SIZE):
+        """GEOIDs as a pandas Categorical; unmatched points are NaN."""
+        codes = self.assign(lon, lat, chunk_size)
+        return pd.Categorical.from_codes(codes, categories=self.geoids)
+
+
+# Benchmark.
+@profiling.profiled("311 sjoin", input_arg="lon")
+def sjoin_assign(tracts, lon, lat, geoid_col="geoid"):
+    """Current notebook path: Point per call, reproject, sjoin within."""
+    from shapely.geometry import Point
+
+    calls = pd.DataFrame({"longitude": lon, "latitude": lat})
+    gdf = gpd.GeoDataFrame(
+        calls,
+        geometry=[Point(xy) for xy in zip(calls.longitude, calls.latitude)],
+        crs="EPSG:4326"
+    ).to_crs(tracts.crs)
+
+    joined = gpd.sjoin(gdf, tracts[[geoid_col, "geometry"]], how="left", predicate="within")
+    joined = joined[~joined.index.duplicated(keep="first")]
+    return joined[geoid_col].to_numpy()
+
+
+def synthetic_points(tracts, n_points, seed=0):
+    """Uniform random lon/lat over the tract bounding box."""
+    rng = np.random.default_rng(seed)
+    minx, miny, maxx, maxy = tracts.to_crs("EPSG:4326").total_bounds
+    return rng.uniform(minx, maxx, n_points), rng.uniform(miny, maxy, n_points)
+
+
+def benchmark(tracts, n_points=2_000_000, geoid_col="geoid", seed=0):
+    """Time the indexed engine against the sjoin path on synthetic points."""
+    lon, lat = synthetic_points(tracts, n_points, seed)
+
+    t0 = time.perf_counter()
+    index = TractIndex(tracts, geoid_col=geoid_col)
+    t_build = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    engine = index.assign_categorical(lon, lat)
+    t_engine = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    baseline = sjoin_assign(tracts, lon, lat, geoid_col)
+    t_sjoin = time.perf_counter() - t0
+
+    engine = np.asarray(engine.astype(object))
+    matches = (pd.isna(engine) & pd.isna(baseline)) | (engine == baseline)
+
+    result = {
+        "n_points": n_points,
+        "index_build_s": round(t_build, 3),
+        "engine_s": round(t_engine, 3),
+        "sjoin_s": round(t_sjoin, 3),
+        "speedup": round(t_sjoin / t_engine, 1),
+        "agreement": float(matches.mean()),
+    }
+    for key, value in result.items():
+        print(f"{key}: {value}")
+    return result
+
+
+if __name__ == "__main__":
+    import sys
+
+    path = sys.argv[1] if len(sys.argv) > 1 else "data/nyc_tracts_2020/nyc_tracts_2020.shp"
+    n = int(sys.argv[2]) if len(sys.argv) > 2 else 2_000_000
+    nyc_tracts = gpd.read_file(path)
+    nyc_tracts = nyc_tracts[nyc_tracts["geoid"].str.startswith(NYC_PREFIXES)].copy()
+    benchmark(nyc_tracts, n)
@@ -0,0 +1,382 @@
+"""
+Markdown to HTML converter shared by build_notebooks.py and build_report.py.
+
+One precompiled scan over the text splits it into logical lines, pulling
+out fenced code blocks and inline code spans as it goes (a code span may
+cross a line break). Code spans are replaced by short indexed sentinels so
+emphasis and link patterns never look inside them, and are restored with a
+single substitution at the end. Block structure (headers, images, lists,
+paragraphs) is then rendered line by line.
+
+Two dialects keep the existing page output byte for byte:
+
+- notebook_markdown(): markdown cells. #/##/### headers, ####
+  as <h3>, <b>/<em>, flat "- " lists, paragraphs split on blank lines.
+- report_markdown(): Project_Report.md sections. ## / ### / #### shifted
+  down one level, # skipped, <strong>/<em>, figure images, lists nested
+  one level ("    - "), one <p> per line.
+
+Inline code is HTML-escaped and fenced code is supported in both
+dialects. REGRESSION_CASES pins the places where this converter differs
+from the per-script converters it replaced; check() runs them and
+benchmark() reports conversion throughput:
+
+    python site_markdown.py
+"""
+
+import html
+import re
+import time
+from collections import namedtuple
+from pathlib import Path
+
+# Tokens.
+TOKEN_RE = re.compile(r'```(\w*)\n(.*?)```|`([^`]+)`|\n', re.DOTALL)
+# Private-use characters mark pulled-out code; they never occur in the sources.
+CODE_OPEN, CODE_CLOSE = '\ue000', '\ue001'
+BLOCK_OPEN, BLOCK_CLOSE = '\ue002', '\ue003'
+CODE_RE = re.compile(f'{CODE_OPEN}(\\d+){CODE_CLOSE}')
+BLOCK_RE = re.compile(f'{BLOCK_OPEN}(\\d+){BLOCK_CLOSE}')
+
+# Inline patterns.
+BOLD_RE = re.compile(r'\*\*(.+?)\*\*')
+NB_ITALIC_RE = re.compile(r'\*(.+?)\*')
+NB_UNDERSCORE_BOLD_RE = re.compile(r'__(.+?)__')
+REPORT_ITALIC_RE = re.compile(r'\*([^*]+)\*')
+LINK_RE = re.compile(r'\[([^\]]+)\]\(([^)]+)\)')
+
+# Block patterns.
+NB_HEADER_RE = re.compile(r'(#{1,4}) (.+)')
+NB_HEADER_TAGS = {1: 'h1', 2: 'h2', 3: 'h3', 4: 'h3'}
+NB_LIST_RE = re.compile(r'- (.+)')
+NB_BLOCK_PREFIXES = ('<h', '<ul', '<ol', '<li', BLOCK_OPEN)
+
+REPORT_HEADERS = (('#### ', 'h3'), ('### ', 'h2'), ('## ', 'h1'))
+IMAGE_RE = re.compile(r'!\[([^\]]*)\]\(([^)]+)\)')
+LIST_RE = re.compile(r'-\s+(.+)')
+LIST_START_RE = re.compile(r'-\s+')
+NESTED_RE = re.compile(r'    -\s+(.+)')
+NESTED_START_RE = re.compile(r'    -\s+')
+EMPHASIS_RE = re.compile(r'\*([^*]+)\*')
+
+Fence = namedtuple('Fence', 'lang code')
+
+
+# Tokenizer.
+def tokenize(md_text):
+    """
+    Split text into logical lines in one scan.
+
+    Returns (lines, codes): lines holds strings, with each inline code span
+    replaced by an indexed sentinel, and Fence entries on a line of their
+    own; codes holds the code span contents.
+    """
+    lines, codes = [], []
+    buf = []
+    pos = 0
+    after_fence = False
+
+    def end_line():
+        text = ''.join(buf)
+        buf.clear()
+        if not after_fence or text.strip():
+            lines.append(text)
+
+    for m in TOKEN_RE.finditer(md_text):
+        buf.append(md_text[pos:m.start()])
+        pos = m.end()
+        if m.group(3) is not None:
+            buf.append(f'{CODE_OPEN}{len(codes)}{CODE_CLOSE}')
+            codes.append(m.group(3))
+        elif m.group(2) is not None:
+            if ''.join(buf).strip():
+                end_line()
+            buf.clear()
+            lines.append(Fence(m.group(1), m.group(2)))
+            after_fence = True
+        else:
+            end_line()
+            after_fence = False
+
+    buf.append(md_text[pos:])
+    end_line()
+    return lines, codes
+
+
+def restore_code(text, codes):
+    """Put escaped inline code back in place of its sentinels."""
+    if not codes:
+        return text
+    return CODE_RE.sub(lambda m: f'<code>{html.escape(codes[int(m.group(1))], quote=False)}</code>', text)
+
+
+def render_fence(fence):
+    lang_class = f' class="language-{fence.lang}"' if fence.lang else ''
+    return f'<pre><code{lang_class}>{html.escape(fence.code)}</code></pre>'
+
+
+def _match(pattern, line):
+    """pattern.fullmatch on text lines; fenced blocks never match."""
+    return pattern.fullmatch(line) if isinstance(line, str) else None
+
+
+# Notebook dialect.
+def notebook_inline(text):
+    """Bold, italic and links for markdown cells."""
+    if '*' in text:
+        text = BOLD_RE.sub(r'<b>\1</b>', text)
+        text = NB_ITALIC_RE.sub(r'<em>\1</em>', text)
+    if '__' in text:
+        text = NB_UNDERSCORE_BOLD_RE.sub(r'<b>\1</b>', text)
+    if '](' in text:
+        text = LINK_RE.sub(r'<a href="\2" target="_blank">\1</a>', text)
+    return text
+
+
+def notebook_markdown(md_text):
+    """Convert a notebook markdown cell to HTML."""
+    lines, codes = tokenize(md_text)
+    out = []
+    blocks = []
+    in_list = False
+
+    for line in lines:
+        if isinstance(line, Fence):
+            if in_list:
+                out.append('</ul>')
+                in_list = False
+            out.extend(['', f'{BLOCK_OPEN}{len(blocks)}{BLOCK_CLOSE}', ''])
+            blocks.append(render_fence(line))
+            continue
+
+        header = NB_HEADER_RE.fullmatch(line)
+        if header:
+            tag = NB_HEADER_TAGS[len(header.group(1))]
+            line = f'<{tag}>{header.group(2)}</{tag}>'
+        line = notebook_inline(line)
+
+        item = NB_LIST_RE.fullmatch(line)
+        if item:
+            if not in_list:
+                out.append('<ul>')
+                in_list = True
+            out.append(f'<li>{item.group(1)}</li>')
+        else:
+            if in_list:
+                out.append('</ul>')
+                in_list = False
+            out.append(line)
+
+    if in_list:
+        out.append('</ul>')
+
+    text = restore_code('\n'.join(out), codes)
+
+    # Paragraphs.
+    result = []
+    for p in text.split('\n\n'):
+        p = p.strip()
+        if p:
+            result.append(p if p.startswith(NB_BLOCK_PREFIXES) else f'<p>{p}</p>')
+    text = '\n'.join(result)
+
+    if blocks:
+        text = BLOCK_RE.sub(lambda m: blocks[int(m.group(1))], text)
+    return text
+
+
+# Report dialect.
+def report_inline(text):
+    """Bold, italic and links for report text."""
+    if '*' in text:
+        text = BOLD_RE.sub(r'<strong>\1</strong>', text)
+        text = REPORT_ITALIC_RE.sub(r'<em>\1</em>', text)
+    if '](' in text:
+        text = LINK_RE.sub(r'<a href="\2" target="_blank">\1</a>', text)
+    return text
+
+
+def report_list(lines, start_idx):
+    """Render a list starting at start_idx, with one level of nesting."""
+    html_parts = ['<ul>']
+    i = start_idx
+
+    while i < len(lines):
+        line = lines[i]
+
+        # Top-level item, with any nested items directly below it.
+        top = _match(LIST_RE, line)
+        if top:
+            content = report_inline(top.group(1))
+            nested_items = []
+            j = i + 1
+            while j < len(lines):
+                nested = _match(NESTED_RE, lines[j])
+                if not nested:
+                    break
+                nested_items.append(report_inline(nested.group(1)))
+                j += 1
+
+            if nested_items:
+                html_parts.append(f'<li>{content}')
+                html_parts.append('<ul>')
+                html_parts.extend(f'<li>{item}</li>' for item in nested_items)
+                html_parts.append('</ul>')
+                html_parts.append('</li>')
+                i = j
+            else:
+                html_parts.append(f'<li>{content}</li>')
+                i += 1
+            continue
+
+        # A blank line continues the list only if another item follows.
+        if isinstance(line, str) and line.strip() == '':
+            if i + 1 < len(lines) and isinstance(lines[i + 1], str) \
+                    and LIST_START_RE.match(lines[i + 1]):
+                i += 1
+                continue
+            break
+        elif isinstance(line, str) and NESTED_START_RE.match(line):
+            # Orphan nested item.
+            i += 1
+            continue
+        else:
+            break
+
+    html_parts.append('</ul>')
+    return '\n'.join(html_parts), i
+
+
+def report_markdown(md_text, image_prefix='images/'):
+    """Convert a Project_Report.md section to HTML."""
+    lines, codes = tokenize(md_text)
+    html_lines = []
+
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+
+        if isinstance(line, Fence):
+            html_lines.append(render_fence(line))
+            i += 1
+            continue
+
+        # Headers shift down one level; "# " section titles are dropped.
+        for prefix, tag in REPORT_HEADERS:
+            if line.startswith(prefix):
+                html_lines.append(f'<{tag}>{line[len(prefix):]}</{tag}>')
+                break
+        else:
+            if line.startswith('# '):
+                i += 1
+                continue
+
+            image = IMAGE_RE.match(line)
+            if image:
+                alt_text, img_path = image.groups()
+                # notebooks/images/EDA/x.png -> images/EDA/x.png (site root).
+                if img_path.startswith('notebooks/images/'):
+                    img_path = image_prefix + img_path[len('notebooks/images/'):]
+                elif img_path.startswith('notebooks/'):
+                    img_path = image_prefix + img_path[len('notebooks/'):]
+                caption = report_inline(alt_text)
+                clean_alt = EMPHASIS_RE.sub(r'\1', alt_text)
+                html_lines.append(f'<figure><img class="report-image" src="{img_path}" alt="{clean_alt}"><figcaption>{caption}</figcaption></figure>')
+                i += 1
+                continue
+
+            if LIST_RE.fullmatch(line):
+                list_html, i = report_list(lines, i)
+                html_lines.append(list_html)
+                continue
+
+            stripped = line.strip()
+            if stripped:
+                html_lines.append(f'<p>{report_inline(stripped)}</p>')
+            i += 1
+            continue
+
+        i += 1
+
+    return restore_code('\n'.join(html_lines), codes)
+
+
+# Regression cases.
+# (dialect, markdown, expected HTML). The old report converter left
+# __CODE_BLOCK_n__ placeholders in the page, passed & and > in inline code
+# through unescaped, and replaced any literal __INLINE_CODE_n__ in the text;
+# the old notebook converter rendered inline code as <b>INLINE_CODE_n</b>
+# and let a link's [text] run across a line break.
+REGRESSION_CASES = [
+    ('report', 'Text ```\nx = 1\n``` after',
+     '<p>Text</p>\n<pre><code>x = 1\n</code></pre>\n<p>after</p>'),
+    ('report', '```python\nif a < b:\n    pass\n``` done',
+     '<pre><code class="language-python">if a &lt; b:\n    pass\n</code></pre>\n<p>done</p>'),
+    ('report', 'Run `a & b > c` first.',
+     '<p>Run <code>a &amp; b &gt; c</code> first.</p>'),
+    ('report', '`x` and __INLINE_CODE_0__ stay apart.',
+     '<p><code>x</code> and __INLINE_CODE_0__ stay apart.</p>'),
+    ('notebook', 'Use `df["a"] > 0` here.',
+     '<p>Use <code>df["a"] &gt; 0</code> here.</p>'),
+    ('notebook', 'See [the\ndocs](https://example.com).',
+     '<p>See [the\ndocs](https://example.com).</p>'),
+    ('notebook', '```\n<b>raw</b>\n```',
+     '<pre><code>&lt;b&gt;raw&lt;/b&gt;\n</code></pre>'),
+]
+
+
+def check(cases=REGRESSION_CASES):
+    """Run the regression cases; returns the failures as (case, got)."""
+    dialects = {'report': report_markdown, 'notebook': notebook_markdown}
+    failures = []
+    for case in cases:
+        dialect, md_text, expected = case
+        got = dialects[dialect](md_text)
+        if got != expected:
+            failures.append((case, got))
+            print(f"FAIL ({dialect}): {md_text!r}\n  expected {expected!r}\n  got      {got!r}")
+    print(f"Regression cases: {len(cases) - len(failures)}/{len(cases)} passed.")
+    return failures
+
+
+# Benchmark.
+def benchmark(report_path='Project_Report.md', notebooks_dir='notebooks', repeat=20):
+    """
+    Conversion throughput (MB/s) on the real report and notebook cells, and
+    on a synthetic code-heavy cell that exercises inline code restoration.
+    """
+    import json
+
+    corpora = {}
+    report_path = Path(report_path)
+    if report_path.exists():
+        corpora['report'] = (report_markdown, [report_path.read_text(encoding='utf-8')])
+
+    cells = []
+    for nb_path in sorted(Path(notebooks_dir).glob('*.ipynb')):
+        nb = json.loads(nb_path.read_text(encoding='utf-8'))
+        cells += [''.join(c.get('source', [])) for c in nb.get('cells', [])
+                  if c.get('cell_type') == 'markdown']
+    if cells:
+        corpora['notebook cells'] = (notebook_markdown, cells)
+
+    line = 'Call `df.groupby("GEOID")` then **`agg`** with `"sum"` and [docs](https://pandas.pydata.org).\n'
+    corpora['code-heavy cell'] = (notebook_markdown, [line * 2000])
+
+    rows = []
+    for name, (func, texts) in corpora.items():
+        size = sum(len(t.encode('utf-8')) for t in texts)
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            for text in texts:
+                func(text)
+        elapsed = (time.perf_counter() - t0) / repeat
+        rows.append((name, size, elapsed))
+        print(f"{name}: {size / 1024:.1f} KB in {elapsed * 1000:.2f} ms ({size / elapsed / 1e6:.1f} MB/s).")
+    return rows
+
+
+if __name__ == '__main__':
+    if check():
+        raise SystemExit(1)
+    benchmark()
@@ -0,0 +1,281 @@
+"""
+Client-side search index for the website.
+
+build_notebooks.py and build_report.py extract search documents while they
+convert a page: one per report subsection, and one per notebook markdown
+cell, code cell and cell output. Each page's documents are cached in
+.build/search/<page>.json so an incremental build only re-extracts the
+pages it rebuilt; build_index() then merges every cached page into an
+inverted index under docs/search/:
+
+    docs/search/
+        index.json        # shard list, prefix length, document table
+        shards/k.json     # term -> [[doc, tf], ...] for terms starting "k"
+
+Shards are keyed by the first SHARD_PREFIX characters of a term, so the
+browser (js/search.js) fetches index.json once and then only the shards
+its query terms fall in. Query terms match index terms by prefix and all
+terms must match; results are ranked by tf-idf.
+
+Terms are lowercase [a-z0-9_] runs, so identifiers such as
+KNN_SUBWAY_dist_mean are indexed whole and by their underscore-separated
+parts.
+
+benchmark() reports index size and query latency on the built site.
+
+Usage:
+
+    python site_search.py [--query "KNN_SUBWAY_dist_mean"]
+"""
+
+import argparse
+import json
+import math
+import re
+import time
+from html.parser import HTMLParser
+from pathlib import Path
+
+from build_manifest import write_gzip, write_if_changed
+
+# Configuration.
+SEARCH_SUBDIR = 'search'
+SHARD_PREFIX = 1
+SNIPPET_CHARS = 160
+MAX_NUMBER_LENGTH = 4
+QUERIES = ['KNN_SUBWAY_dist_mean', 'shap', 'GridSearchCV', 'extreme heat', 'ndvi', 'zonal', 'sjoin']
+
+STOPWORDS = frozenset('''
+    an and are as at be by for from has in is it its of on or that the this to was were with
+'''.split())
+
+TERM_RE = re.compile(r'[a-z0-9_]+')
+IMAGE_RE = re.compile(r'!\[([^\]]*)\]\([^)]+\)')
+LINK_RE = re.compile(r'\[([^\]]+)\]\([^)]+\)')
+MARKUP_RE = re.compile(r'[*`#>]+')
+
+
+# Text extraction.
+class _TextParser(HTMLParser):
+    """Visible text of an HTML fragment, skipping scripts and styles."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ('script', 'style'):
+            self.skip += 1
+
+    def handle_endtag(self, tag):
+        if tag in ('script', 'style') and self.skip:
+            self.skip -= 1
+
+    def handle_data(self, data):
+        if not self.skip:
+            self.parts.append(data)
+
+
+def html_text(html_content):
+    parser = _TextParser()
+    parser.feed(html_content)
+    return ' '.join(' '.join(parser.parts).split())
+
+
+def markdown_text(md_text):
+    """Markdown reduced to plain text: link and image text kept, markup dropped."""
+    text = IMAGE_RE.sub(r'\1', md_text)
+    text = LINK_RE.sub(r'\1', text)
+    return MARKUP_RE.sub(' ', text)
+
+
+def terms(text):
+    """Index terms of text, with identifiers also split on underscores."""
+    found = []
+    for token in TERM_RE.findall(text.lower()):
+        token = token.strip('_')
+        if '_' in token:
+            found.extend(part for part in token.split('_') if _keep(part))
+        if _keep(token):
+            found.append(token)
+    return found
+
+
+def _keep(term):
+    if len(term) < 2 or term in STOPWORDS:
+        return False
+    # Long numbers (GEOIDs, counts, coefficients) only bloat the index.
+    return not (term[0].isdigit() and len(term) > MAX_NUMBER_LENGTH)
+
+
+def snippet(text):
+    text = ' '.join(text.split())
+    return text if len(text) <= SNIPPET_CHARS else text[:SNIPPET_CHARS].rstrip() + '…'
+
+
+def document(kind, label, anchor, text):
+    """
+    One search hit. kind is 'report', 'markdown', 'code' or 'output';
+    anchor is the heading text (report) or cell block index (notebooks)
+    js/search.js scrolls to.
+    """
+    return {'kind': kind, 'label': label, 'anchor': anchor, 'text': text}
+
+
+# Per-page document cache.
+def documents_path(cache_dir, page):
+    return Path(cache_dir) / f'{page}.json'
+
+
+def save_documents(cache_dir, page, title, docs):
+    path = documents_path(cache_dir, page)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    write_if_changed(path, json.dumps({'page': page, 'title': title, 'docs': docs}, ensure_ascii=False))
+
+
+# Index.
+def build_index(cache_dir, search_dir):
+    """Merge every page's cached documents into sharded index files; returns size stats."""
+    cache_dir, search_dir = Path(cache_dir), Path(search_dir)
+    shards_dir = search_dir / 'shards'
+    shards_dir.mkdir(parents=True, exist_ok=True)
+
+    table = []
+    postings = {}
+    for path in sorted(cache_dir.glob('*.json')):
+        cached = json.loads(path.read_text(encoding='utf-8'))
+        for doc in cached['docs']:
+            doc_id = len(table)
+            table.append([cached['page'], cached['title'], doc['kind'], doc['label'],
+                          doc['anchor'], snippet(doc['text'])])
+            counts = {}
+            for term in terms(doc['text']):
+                counts[term] = counts.get(term, 0) + 1
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append([doc_id, tf])
+
+    shards = {}
+    for term in sorted(postings):
+        shards.setdefault(term[:SHARD_PREFIX], {})[term] = postings[term]
+
+    stats = {'docs': len(table), 'terms': len(postings), 'shards': len(shards),
+             'bytes': 0, 'gzip_bytes': 0, 'largest_shard': 0}
+
+    def write(path, obj):
+        write_if_changed(path, json.dumps(obj, ensure_ascii=False, separators=(',', ':')))
+        gz_path = write_gzip(path)
+        stats['bytes'] += path.stat().st_size
+        stats['gzip_bytes'] += gz_path.stat().st_size
+        return path.stat().st_size
+
+    for prefix, shard in shards.items():
+        size = write(shards_dir / f'{prefix}.json', shard)
+        stats['largest_shard'] = max(stats['largest_shard'], size)
+    write(search_dir / 'index.json', {
+        'prefix': SHARD_PREFIX,
+        'shards': sorted(shards),
+        'fields': ['page', 'title', 'kind', 'label', 'anchor', 'snippet'],
+        'docs': table,
+    })
+
+    # Drop shards whose prefix no longer occurs.
+    for path in shards_dir.glob('*.json*'):
+        if path.name.split('.')[0] not in shards:
+            path.unlink()
+    return stats
+
+
+def describe(stats):
+    return (f"Search Index: {stats['docs']:,} documents, {stats['terms']:,} terms in "
+            f"{stats['shards']} shards, {stats['bytes'] / 1024:.1f} KB "
+            f"({stats['gzip_bytes'] / 1024:.1f} KB gzipped, largest shard "
+            f"{stats['largest_shard'] / 1024:.1f} KB).")
+
+
+# Query (mirrors js/search.js).
+class SearchIndex:
+    """Index reader that loads shards on demand, as the browser does."""
+
+    def __init__(self, search_dir):
+        self.search_dir = Path(search_dir)
+        meta = json.loads((self.search_dir / 'index.json').read_text(encoding='utf-8'))
+        self.prefix = meta['prefix']
+        self.available = set(meta['shards'])
+        self.docs = meta['docs']
+        self.shards = {}
+
+    def shard(self, prefix):
+        if prefix not in self.shards:
+            path = self.search_dir / 'shards' / f'{prefix}.json'
+            self.shards[prefix] = json.loads(path.read_text(encoding='utf-8')) if prefix in self.available else {}
+        return self.shards[prefix]
+
+    def search(self, query, limit=20):
+        """[(score, doc row)] for documents matching every query term by prefix."""
+        scores = None
+        for term in dict.fromkeys(terms(query)):
+            matched = {}
+            for candidate, postings in self.shard(term[:self.prefix]).items():
+                if not candidate.startswith(term):
+                    continue
+                idf = math.log(1 + len(self.docs) / len(postings))
+                for doc_id, tf in postings:
+                    matched[doc_id] = matched.get(doc_id, 0) + tf * idf
+            if scores is None:
+                scores = matched
+            else:
+                scores = {d: s + matched[d] for d, s in scores.items() if d in matched}
+        if not scores:
+            return []
+        ranked = sorted(scores.items(), key=lambda item: -item[1])[:limit]
+        return [(score, self.docs[doc_id]) for doc_id, score in ranked]
+
+
+def benchmark(search_dir, queries=QUERIES, repeat=20):
+    """Cold (index and shards read from disk) and warm query latency."""
+    search_dir = Path(search_dir)
+    rows = []
+    for query in queries:
+        t0 = time.perf_counter()
+        index = SearchIndex(search_dir)
+        results = index.search(query)
+        cold = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            index.search(query)
+        warm = (time.perf_counter() - t0) / repeat
+
+        shards = len(index.shards)
+        rows.append((query, len(results), shards, cold, warm))
+        top = f", top: {results[0][1][0]} / {results[0][1][3]}" if results else ''
+        print(f"'{query}': {len(results)} hits from {shards} shard(s), "
+              f"{cold * 1000:.2f} ms cold, {warm * 1000:.3f} ms warm{top}.")
+    return rows
+
+
+# Main.
+def main():
+    parser = argparse.ArgumentParser(description='Report search index size and query latency.')
+    parser.add_argument('--query', action='append',
+                        help='query to time (repeatable); defaults to a fixed set')
+    args = parser.parse_args()
+
+    script_dir = Path(__file__).parent.resolve()
+    search_dir = script_dir / 'docs' / SEARCH_SUBDIR
+    if not (search_dir / 'index.json').exists():
+        print(f"ERROR: No search index in {search_dir}; run build_notebooks.py and build_report.py.")
+        return
+
+    sizes = [p.stat().st_size for p in search_dir.rglob('*.json')]
+    gz_sizes = [p.stat().st_size for p in search_dir.rglob('*.json.gz')]
+    index_size = (search_dir / 'index.json').stat().st_size
+    print(f"Index: {len(sizes)} files, {sum(sizes) / 1024:.1f} KB ({sum(gz_sizes) / 1024:.1f} KB gzipped); "
+          f"index.json {index_size / 1024:.1f} KB.")
+    print()
+    benchmark(search_dir, args.query or QUERIES)
+
+
+if __name__ == '__main__':
+    main()
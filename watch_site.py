@@ -0,0 +1,265 @@
+"""
+Watch mode for the website: targeted rebuilds and a live-reloading dev server.
+
+Polls notebooks/*.ipynb and Project_Report.md. When one changes, only its
+page is rebuilt: build_notebooks.build_pages() and build_report.build_pages()
+skip every page whose manifest inputs are unchanged, so a notebook edit
+converts that one notebook and a report edit converts only the
+SECTION_MAPPING section whose text changed. Builds run in-process (no
+worker pool) with the manifests kept in memory.
+
+docs/ is served on http://localhost:8000 with caching disabled, using the
+precompressed <file>.gz copies when the browser accepts gzip. Served
+index.html gets a small script that listens on /__livereload (server-sent
+events); after a rebuild the browser re-fetches the page it is showing,
+keeping its scroll position, instead of reloading the whole site.
+
+Each rebuild prints the time from detecting the save to notifying the
+browser.
+
+Usage:
+
+    python watch_site.py [--port 8000] [--interval 0.05]
+"""
+
+import argparse
+import functools
+import json
+import queue
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import build_notebooks
+import build_report
+from build_manifest import MANIFEST_DIR, BuildManifest
+
+# Configuration.
+PORT = 8000
+POLL_INTERVAL = 0.05
+RELOAD_PATH = '/__livereload'
+
+RELOAD_SCRIPT = '''
+<script>
+// Live reload (watch_site.py): re-fetch the current page when it is rebuilt.
+(function () {
+    var current = null;
+    document.addEventListener('click', function (e) {
+        var link = e.target.closest && e.target.closest('a[data-page]');
+        if (link) { current = link.dataset.page; }
+    }, true);
+    // Pages shown without a click seen here (app.js's start page) are
+    // found through the active nav link; failing that, reload everything.
+    function shownPage() {
+        if (current !== null) { return current; }
+        var active = document.querySelector('.panel-left-nav a.active[data-page]');
+        return active ? active.dataset.page : null;
+    }
+    var source = new EventSource('%s');
+    source.onmessage = function (e) {
+        var pages = JSON.parse(e.data);
+        current = shownPage();
+        if (current === null) { location.reload(); return; }
+        if (pages.indexOf(current) === -1) { return; }
+        var link = document.querySelector('.panel-left-nav a[data-page="' + current + '"]')
+            || document.querySelector('a[data-page="' + current + '"]');
+        if (!link) { location.reload(); return; }
+        var middle = document.getElementById('content-middle');
+        var scroll = middle.scrollTop;
+        var observer = new MutationObserver(function () {
+            if (middle.textContent !== 'Loading...') {
+                observer.disconnect();
+                requestAnimationFrame(function () { middle.scrollTop = scroll; });
+            }
+        });
+        observer.observe(middle, {childList: true});
+        link.click();
+    };
+})();
+</script>
+''' % RELOAD_PATH
+
+
+# Live reload.
+class ReloadHub:
+    """Fan-out of rebuilt page names to every connected browser."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clients = []
+
+    def subscribe(self):
+        q = queue.Queue()
+        with self.lock:
+            self.clients.append(q)
+        return q
+
+    def unsubscribe(self, q):
+        with self.lock:
+            self.clients.remove(q)
+
+    def publish(self, pages):
+        with self.lock:
+            for q in self.clients:
+                q.put(pages)
+            return len(self.clients)
+
+
+class DevHandler(SimpleHTTPRequestHandler):
+    """Static files from docs/ without caching, plus the reload stream."""
+
+    hub = None
+
+    def end_headers(self):
+        self.send_header('Cache-Control', 'no-store')
+        super().end_headers()
+
+    def do_GET(self):
+        path = self.path.split('?')[0]
+        if path == RELOAD_PATH:
+            return self.stream_reloads()
+        if path in ('/', '/index.html'):
+            return self.send_index()
+        gz_path = Path(self.translate_path(path) + '.gz')
+        if 'gzip' in self.headers.get('Accept-Encoding', '') and gz_path.is_file():
+            return self.send_gzip(gz_path)
+        return super().do_GET()
+
+    def send_gzip(self, gz_path):
+        data = gz_path.read_bytes()
+        self.send_response(200)
+        self.send_header('Content-Type', self.guess_type(str(gz_path)[:-3]))
+        self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_index(self):
+        index = Path(self.directory) / 'index.html'
+        body = index.read_text(encoding='utf-8').replace('</body>', RELOAD_SCRIPT + '</body>')
+        data = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def stream_reloads(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.end_headers()
+        q = self.hub.subscribe()
+        try:
+            while True:
+                try:
+                    pages = q.get(timeout=15)
+                    self.wfile.write(f"data: {json.dumps(pages)}\n\n".encode())
+                except queue.Empty:
+                    self.wfile.write(b': keep-alive\n\n')
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            self.hub.unsubscribe(q)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(site_dir, port, hub):
+    handler = functools.partial(DevHandler, directory=str(site_dir))
+    DevHandler.hub = hub
+    server = ThreadingHTTPServer(('localhost', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# Watching.
+def snapshot(paths):
+    """(size, mtime_ns) per existing path."""
+    stamps = {}
+    for path in paths:
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            continue
+        stamps[path] = (st.st_size, st.st_mtime_ns)
+    return stamps
+
+
+def watched_paths(notebooks_dir, report_path):
+    paths = [notebooks_dir / nb['file'] for nb in build_notebooks.NOTEBOOKS]
+    if report_path is not None:
+        paths.append(report_path)
+    return paths
+
+
+# Main.
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild changed pages and live-reload the site.')
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--interval', type=float, default=POLL_INTERVAL,
+                        help='seconds between polls of the sources')
+    parser.add_argument('--inline-images', action='store_true',
+                        help='embed notebook figures as base64 instead of image files')
+    parser.add_argument('--truncate-outputs', action='store_true',
+                        help='truncate long outputs instead of chunking them')
+    args = parser.parse_args()
+
+    script_dir = Path(__file__).parent.resolve()
+    notebooks_dir, pages_dir = build_notebooks.find_dirs(script_dir)
+    report_path, _ = build_report.find_paths(script_dir)
+    images_dir = None if args.inline_images else pages_dir.parent / 'images' / build_notebooks.IMAGE_SUBDIR
+    outputs_dir = None if args.truncate_outputs else pages_dir.parent / build_notebooks.OUTPUTS_SUBDIR
+
+    nb_manifest = BuildManifest(script_dir / MANIFEST_DIR / 'notebooks.json')
+    report_manifest = BuildManifest(script_dir / MANIFEST_DIR / 'report.json')
+
+    def rebuild():
+        pages = build_notebooks.build_pages(notebooks_dir, pages_dir, images_dir, outputs_dir,
+                                            nb_manifest, verbose=False)
+        if report_path is not None:
+            pages += build_report.build_pages(report_path, pages_dir, report_manifest,
+                                              verbose=False)
+        return [Path(p).stem for p in pages]
+
+    # Bring everything up to date before serving.
+    initial = rebuild()
+    print(f"Initial build: {len(initial)} pages rebuilt.")
+
+    hub = ReloadHub()
+    serve(pages_dir.parent, args.port, hub)
+    print(f"Serving {pages_dir.parent} on http://localhost:{args.port}/ (Ctrl+C to stop).")
+
+    paths = watched_paths(notebooks_dir, report_path)
+    stamps = snapshot(paths)
+    try:
+        while True:
+            time.sleep(args.interval)
+            current = snapshot(paths)
+            if current == stamps:
+                continue
+            t0 = time.perf_counter()
+            changed = [p.name for p in paths if current.get(p) != stamps.get(p)]
+            stamps = current
+            try:
+                pages = rebuild()
+            except Exception as e:
+                print(f"Build failed for {', '.join(changed)}: {e}")
+                continue
+            clients = hub.publish(pages) if pages else 0
+            elapsed_ms = (time.perf_counter() - t0) * 1000
+            if pages:
+                print(f"{', '.join(changed)} -> {', '.join(pages)} in {elapsed_ms:.0f} ms "
+                      f"({clients} browsers notified).")
+            else:
+                print(f"{', '.join(changed)}: no page changed ({elapsed_ms:.0f} ms).")
+    except KeyboardInterrupt:
+        print()
+        print("Stopped.")
+
+
+if __name__ == '__main__':
+    main()